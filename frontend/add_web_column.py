@@ -1,10 +1,6 @@
-from app import db, app
-from sqlalchemy import text
+from app import create_app, create_schema
 
-with app.app_context():
-    try:
-        with db.engine.connect() as conn:
-            conn.execute(text('ALTER TABLE biller ADD COLUMN web TEXT;'))
-        print("Added 'web' column to 'biller' table.")
-    except Exception as e:
-        print(f"Error (maybe column already exists): {e}")
+# The web column is now added by migration 1, applied by create_schema.py.
+with create_app().app_context():
+    applied = create_schema()
+    print(f"Schema is up to date (applied migrations: {applied or 'none'}).")
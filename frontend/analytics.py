@@ -0,0 +1,164 @@
+"""Onboarding throughput and cycle-time metrics built from status history.
+
+All metrics for a request come from one projected query over
+status_history (plus the daily roll-ups left by retention), grouped with
+vectorized pandas operations. Results are cached per (category, bucket,
+range) and reused until the history watermark moves.
+"""
+from collections import OrderedDict
+from datetime import datetime
+import threading
+
+from sqlalchemy import text
+
+BUCKETS = {'day': 'D', 'week': 'W-SUN', 'month': 'M'}
+THROUGHPUT_STATUSES = ('in_progress', 'go_live')
+
+
+def history_watermark(conn):
+    """(min id, max id) of status_history.
+
+    A new history row moves the max and retention compaction moves the
+    min, so either invalidates cached metrics. Both are primary key seeks.
+    """
+    row = conn.execute(text('SELECT MIN(id), MAX(id) FROM status_history')).first()
+    return (row[0], row[1])
+
+
+class AnalyticsCache:
+    """Small thread-safe LRU of results tagged with the watermark they were built at."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, watermark):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != watermark:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, watermark, value):
+        with self._lock:
+            self._entries[key] = (watermark, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _load_history(conn, category, since, until):
+    clauses = []
+    params = {}
+    if category:
+        clauses.append('category = :category')
+        params['category'] = category
+    if since:
+        clauses.append('changed_at >= :since')
+        params['since'] = since
+    if until:
+        clauses.append('changed_at < :until')
+        params['until'] = until
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    history = conn.execute(text(
+        f'SELECT biller_id, category, old_status, new_status, changed_at FROM status_history {where}'
+    ), params).all()
+
+    daily_clauses = [c.replace('changed_at', 'day') for c in clauses]
+    daily_params = {k: (v.date() if isinstance(v, datetime) else v) for k, v in params.items()}
+    daily_where = f"WHERE {' AND '.join(daily_clauses)}" if daily_clauses else ''
+    daily = conn.execute(text(
+        f'SELECT day, new_status, SUM(count) FROM status_history_daily {daily_where} GROUP BY day, new_status'
+    ), daily_params).all()
+    return history, daily
+
+
+def onboarding_metrics(conn, category=None, bucket='week', since=None, until=None):
+    """Throughput per period and not_started -> go_live cycle time per category.
+
+    ``throughput`` holds dense arrays aligned with ``periods``. Cycle time
+    is measured per biller, in days, from the time it entered not_started
+    to its first go_live after that. Where history has no entry into
+    not_started, its first move out of not_started is used instead,
+    except when that move went straight to go_live: the time spent waiting
+    is unknown, so those billers are left out and counted in
+    ``direct_to_go_live``. Rolled-up history only contributes to
+    throughput since it no longer identifies billers.
+    """
+    import pandas as pd
+
+    freq = BUCKETS[bucket]
+    history, daily = _load_history(conn, category, since, until)
+    df = pd.DataFrame.from_records(
+        history, columns=['biller_id', 'category', 'old_status', 'new_status', 'changed_at']
+    )
+    df['changed_at'] = pd.to_datetime(df['changed_at'])
+
+    # Throughput: transitions into each status per period
+    entered = df.loc[df['new_status'].isin(THROUGHPUT_STATUSES), ['changed_at', 'new_status']]
+    entered = entered.assign(count=1)
+    rolled = pd.DataFrame.from_records(daily, columns=['changed_at', 'new_status', 'count'])
+    rolled['changed_at'] = pd.to_datetime(rolled['changed_at'])
+    entered = pd.concat([entered, rolled[rolled['new_status'].isin(THROUGHPUT_STATUSES)]])
+    entered['period'] = entered['changed_at'].dt.to_period(freq).dt.start_time
+    series = (
+        entered.groupby(['period', 'new_status'])['count'].sum()
+        .unstack(fill_value=0)
+        .reindex(columns=list(THROUGHPUT_STATUSES), fill_value=0)
+        .sort_index()
+    )
+    if not series.empty:
+        full_range = pd.period_range(series.index.min(), series.index.max(), freq=freq).start_time
+        series = series.reindex(full_range, fill_value=0)
+
+    # Cycle time: entry into not_started (or, failing that, the first exit
+    # from it) to the first go_live after it
+    tracked = df[df['biller_id'].notna()].sort_values('changed_at')
+    keys = ['biller_id', 'category']
+    entries = (
+        tracked[tracked['new_status'] == 'not_started']
+        .groupby(keys)['changed_at'].min()
+        .rename('entered_at')
+    )
+    exits = (
+        tracked[tracked['old_status'] == 'not_started']
+        .groupby(keys)[['changed_at', 'new_status']].first()
+        .rename(columns={'changed_at': 'left_at', 'new_status': 'left_to'})
+    )
+    starts = pd.concat([entries, exits], axis=1).reset_index()
+    direct = starts['entered_at'].isna() & (starts['left_to'] == 'go_live')
+    direct_counts = starts[direct].groupby('category').size()
+    starts = starts[~direct].assign(started_at=lambda f: f['entered_at'].fillna(f['left_at']))
+    lives = tracked.loc[tracked['new_status'] == 'go_live', ['biller_id', 'changed_at']]
+    cycles = starts[keys + ['started_at']].merge(lives, on='biller_id')
+    cycles = cycles[cycles['changed_at'] >= cycles['started_at']]
+    cycles = cycles.groupby(keys, as_index=False).agg(
+        started_at=('started_at', 'first'), live_at=('changed_at', 'min')
+    )
+    cycles['days'] = (cycles['live_at'] - cycles['started_at']).dt.total_seconds() / 86400
+    stats = cycles.groupby('category')['days'].agg(
+        count='size', median='median', p90=lambda days: days.quantile(0.9)
+    )
+    cycle_time = {}
+    for cat in sorted(set(stats.index) | set(direct_counts.index)):
+        measured = cat in stats.index
+        cycle_time[cat] = {
+            'count': int(stats.at[cat, 'count']) if measured else 0,
+            'median': round(float(stats.at[cat, 'median']), 2) if measured else None,
+            'p90': round(float(stats.at[cat, 'p90']), 2) if measured else None,
+            'direct_to_go_live': int(direct_counts.get(cat, 0)),
+        }
+
+    return {
+        'bucket': bucket,
+        'category': category,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'throughput': {
+            'periods': [period.date().isoformat() for period in series.index],
+            **{status: [int(v) for v in series[status]] for status in THROUGHPUT_STATUSES}
+        },
+        'cycle_time_days': cycle_time
+    }
@@ -1,202 +1,284 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
+import base64
+import csv
+import functools
+import io
 import json
+import sqlite3
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from migrations import run_migrations
+import config
+from excel_export import WorkbookExporter, stream_workbook
+import events
+from models import (db, Biller, ImportJob, StatusHistory, STATUSES, bump_data_version,
+                    current_data_version, dashboard_overview, lock_billers, rebuild_status_counters,
+                    record_status_change, refresh_status_counter_dates,
+                    status_counts, _add_to_status_cube, _adjust_status_counter)
+import analytics
+import metrics
+import read_cache
+import heatmap
+import imports
+import search
 from datetime import datetime
-import pandas as pd
 import os
 import logging
+import uuid
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin"], "expose_headers": ["Content-Type", "X-Total-Count"]}}, supports_credentials=True)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ISP_EXCEL_FILE = os.path.join(BASE_DIR, 'noti.xlsx')
-logger.info(f'ISP Excel file path: {ISP_EXCEL_FILE}')
+
+api = Blueprint('api', __name__)
+
 # Enable CORS for all routes
-@app.after_request
+@api.after_app_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
     return response
 
-# Database Configuration
-import os
-db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'biller_tracker.db'))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# Ensure instance directory exists
-os.makedirs(os.path.dirname(db_path), exist_ok=True)
-
-# ISP Status History Model
-class ISPStatusHistory(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    isp_name = db.Column(db.String(100), nullable=False)
-    old_status = db.Column(db.String(20))
-    new_status = db.Column(db.String(20), nullable=False)
-    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'isp_name': self.isp_name,
-            'old_status': self.old_status,
-            'new_status': self.new_status,
-            'changed_at': self.changed_at.isoformat() if self.changed_at else None
-        }
-
-# Biller Model
-class Biller(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    status = db.Column(db.String(20), nullable=False)
-    is_top_50 = db.Column(db.Boolean, default=False)
-    onboard_date = db.Column(db.DateTime, default=datetime.utcnow)
-    notes = db.Column(db.Text)
-    web = db.Column(db.String(255))  # New column for website
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'category': self.category,
-            'status': self.status,
-            'is_top_50': self.is_top_50,
-            'onboard_date': self.onboard_date.isoformat() if self.onboard_date else None,
-            'notes': self.notes,
-            'web': self.web
-        }
-
-# Create database tables
-with app.app_context():
-    db.create_all()
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the single writer; NORMAL sync is safe under WAL."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_SECONDS * 1000}')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+# GET routes whose responses are not a function of the stored data
+UNVERSIONED_PATHS = {'/api/events'}
+# Import progress changes long before the import bumps the data version
+UNVERSIONED_PREFIXES = ('/api/imports/',)
+
+@api.before_app_request
+def check_data_version():
+    """Answer conditional GETs on /api/* with 304 before any query runs."""
+    if request.method != 'GET' or not request.path.startswith('/api/') or request.path in UNVERSIONED_PATHS \
+            or request.path.startswith(UNVERSIONED_PREFIXES):
+        return None
+    version, updated_at = current_data_version()
+    g.data_version = (version, updated_at)
+    etag = str(version)
+    # Only the ETag is exact. If-Modified-Since has one-second resolution,
+    # so a write in the same second as Last-Modified would still get a 304
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        return Response(status=304)
+    return None
+
+@api.after_app_request
+def add_data_version_headers(response):
+    data_version = g.get('data_version')
+    if data_version and response.status_code in (200, 304):
+        version, updated_at = data_version
+        response.set_etag(str(version), weak=True)
+        if updated_at:
+            response.last_modified = updated_at
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Server-sent events for status changes go through the app's
+# events.EventBroker, created by create_app()
+def publish_status_change(biller, old_status):
+    """Broadcast a committed status change with the counters it affected."""
+    publish_status_changes([
+        (biller.id, biller.name, biller.category, biller.is_top_50, old_status, biller.status)
+    ])
+
+def publish_status_changes(changes):
+    """Broadcast (id, name, category, is_top_50, old_status, new_status) tuples.
+
+    Cached list responses built from the changed billers are dropped first,
+    then connected dashboards are notified.
+    """
+    invalidate_cached_lists(changes)
+    event_broker = current_app.extensions['event_broker']
+    if not event_broker.subscriber_count:
+        return
+    dashboard = None
+    category_counts = {}
+    for biller_id, name, category, is_top_50, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if dashboard is None:
+            dashboard = dashboard_overview()
+        if category not in category_counts:
+            category_counts[category] = status_counts(category=category)
+        event_broker.publish('status', {
+            'id': biller_id,
+            'name': name,
+            'category': category,
+            'is_top_50': bool(is_top_50),
+            'old_status': old_status,
+            'new_status': new_status,
+            'counters': category_counts[category],
+            'dashboard': dashboard
+        })
 
-@app.route('/api/dashboard-overview')
+# Serialized responses of the list endpoints live in the app's
+# read_cache.ResponseCache, created by create_app()
+def cached_response(*tags):
+    """Serve a GET view from response_cache, storing its 200 JSON bodies under ``tags``."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            key = read_cache.make_key(request.path, request.args)
+            response_cache = read_cache.current()
+            body = response_cache.get(key)
+            if body is not None:
+                return Response(body, mimetype='application/json')
+            generation = response_cache.generation()
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response_cache.put(key, response.get_data(), tags, generation)
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_cached_lists(changes):
+    tags = set()
+    for _, _, category, is_top_50, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        tags.add(f'category:{category}')
+        if is_top_50:
+            tags.add('top_50')
+    if tags:
+        read_cache.current().invalidate(*tags)
+
+@api.route('/api/events')
+def stream_events():
+    event_broker = current_app.extensions['event_broker']
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        # Every stream pins a server thread; keep the rest for the API. A
+        # 200 that only carries retry: makes EventSource reconnect later,
+        # any other status would make it stop for good
+        response = Response(events.format_retry(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    response = Response(event_broker.stream(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def json_records(keys, statement):
+    """Run a column-only select and return its rows as a JSON array of objects.
+
+    Rows stay plain tuples (no ORM identity map or unused columns such as
+    notes) and are encoded once in column order without key sorting.
+    """
+    rows = db.session.execute(statement).all()
+    body = json.dumps([dict(zip(keys, row)) for row in rows], separators=(',', ':'))
+    return Response(body, mimetype='application/json')
+
+@api.route('/api/dashboard-overview')
 def get_dashboard_overview():
-    total_billers = db.session.query(Biller).count()
-    unavailable_isp = db.session.query(Biller).filter_by(category='ISP').filter(Biller.status != 'go_live').count()
-    unavailable_mfi = db.session.query(Biller).filter_by(category='MFI').filter(Biller.status != 'go_live').count()
-    last_updated = db.session.query(db.func.max(Biller.onboard_date)).scalar()
-    return jsonify({
-        'target_count': total_billers,
-        'unavailable_isp': unavailable_isp,
-        'unavailable_mfi': unavailable_mfi,
-        'last_updated': last_updated.isoformat() if last_updated else None
-    })
+    return jsonify(dashboard_overview())
 
-@app.route('/api/top-50-billers', methods=['GET', 'OPTIONS'])
+@api.route('/api/top-50-billers', methods=['GET', 'OPTIONS'])
+@cached_response('top_50')
 def get_top_50_billers():
     try:
-        billers = Biller.query.filter_by(is_top_50=True).all()
-        biller_data = [
-            {
-                'Biller': b.name,
-                'Web': b.web or '',
-                'Status': b.status,
-                'Category': b.category
-            }
-            for b in billers
-        ]
-        return jsonify(biller_data)
+        return json_records(
+            ('Biller', 'Web', 'Status', 'Category'),
+            db.select(Biller.name, db.func.coalesce(Biller.web, ''), Biller.status, Biller.category)
+            .where(Biller.is_top_50 == True)
+        )
     except Exception as e:
         logger.error(f'Exception in /api/top-50-billers: {e}')
         return jsonify({'error': str(e)}), 500
 
 from datetime import datetime
 
-@app.route('/api/top-50-billers/status', methods=['POST'])
+@api.route('/api/top-50-billers/status', methods=['POST'])
 def update_top_50_biller_status():
-    data = request.get_json()
-    print('DEBUG /api/top-50-billers/status received data:', data, flush=True)
-    biller_name = data.get('Biller')
-    new_status = data.get('Status')
-    integration_date = data.get('integration_date')
-    onboarding_date = data.get('onboarding_date')
-
-    if not biller_name or not new_status:
-        return jsonify({'success': False, 'error': 'Missing biller or status'}), 400
-
-    # Find the biller in the database
-    biller = Biller.query.filter_by(name=biller_name, category='Top 50').first()
-    if not biller:
-        return jsonify({'success': False, 'error': 'Biller not found'}), 404
-
-    # Update the status and dates
-    biller.status = new_status
-    if integration_date:
-        try:
-            biller.integration_date = datetime.strptime(integration_date, "%Y-%m-%d")
-        except Exception:
-            pass  # Ignore if field or format is missing
-    if onboarding_date:
-        try:
-            biller.onboard_date = datetime.strptime(onboarding_date, "%Y-%m-%d")
-        except Exception:
-            pass  # Ignore if field or format is missing
-    db.session.commit()
+    try:
+        data = request.get_json()
+        logger.debug('/api/top-50-billers/status received %s', data)
+        biller_name = data.get('Biller')
+        new_status = data.get('Status')
+        integration_date = data.get('integration_date')
+        onboarding_date = data.get('onboarding_date')
+
+        if not biller_name or not new_status:
+            return jsonify({'success': False, 'error': 'Missing biller or status'}), 400
+
+        if new_status not in STATUSES:
+            return jsonify({'success': False, 'error': 'Invalid status'}), 400
 
-    return jsonify({'success': True, 'message': 'Status updated successfully'})
+        # Find the biller in the database
+        biller = lock_billers(Biller.query.filter_by(name=biller_name, category='Top 50')).first()
+        if not biller:
+            return jsonify({'success': False, 'error': 'Biller not found'}), 404
 
+        # Update the status and dates
+        old_status = biller.status
+        biller.status = new_status
+        if integration_date:
+            try:
+                biller.integration_date = datetime.strptime(integration_date, "%Y-%m-%d")
+            except Exception:
+                pass  # Ignore if field or format is missing
+        if onboarding_date:
+            try:
+                biller.onboard_date = datetime.strptime(onboarding_date, "%Y-%m-%d")
+            except Exception:
+                pass  # Ignore if field or format is missing
+        record_status_change(biller, old_status)
+        bump_data_version()
+        if onboarding_date:
+            # The edited date may have been the latest one, recompute it
+            db.session.flush()
+            refresh_status_counter_dates()
+        db.session.commit()
+        publish_status_change(biller, old_status)
 
-@app.route('/api/unavailable-isp', methods=['GET'])
+        return jsonify({
+            'success': True,
+            'message': 'Status updated successfully',
+            'dashboard': status_counts(is_top_50=True)
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Exception in /api/top-50-billers/status: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/unavailable-isp', methods=['GET'])
+@cached_response('category:ISP')
 def get_unavailable_isp():
     try:
-        isps = Biller.query.filter_by(category='ISP').all()
-        isp_data = [
-            {
-                'ISP': b.name,
-                'Web': b.web or '',
-                'Status': b.status
-            }
-            for b in isps
-        ]
-        return jsonify(isp_data)
+        return json_records(
+            ('ISP', 'Web', 'Status'),
+            db.select(Biller.name, db.func.coalesce(Biller.web, ''), Biller.status)
+            .where(Biller.category == 'ISP')
+        )
     except Exception as e:
         logger.error(f'Exception in /api/unavailable-isp: {e}')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/unavailable-mfi', methods=['GET'])
+@api.route('/api/unavailable-mfi', methods=['GET'])
+@cached_response('category:MFI')
 def get_unavailable_mfi():
     try:
-        mfis = Biller.query.filter_by(category='MFI').all()
-        mfi_data = [
-            {
-                'MFI': b.name,
-                'Web': b.web or '',
-                'Status': b.status
-            }
-            for b in mfis
-        ]
-        return jsonify(mfi_data)
+        return json_records(
+            ('MFI', 'Web', 'Status'),
+            db.select(Biller.name, db.func.coalesce(Biller.web, ''), Biller.status)
+            .where(Biller.category == 'MFI')
+        )
     except Exception as e:
         logger.error(f'Exception in /api/unavailable-mfi: {e}')
         return jsonify({'error': str(e)}), 500
 
-# MFI Status History Model
-class MFIStatusHistory(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    mfi_name = db.Column(db.String(100), nullable=False)
-    old_status = db.Column(db.String(20))
-    new_status = db.Column(db.String(20), nullable=False)
-    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'mfi_name': self.mfi_name,
-            'old_status': self.old_status,
-            'new_status': self.new_status,
-            'changed_at': self.changed_at.isoformat() if self.changed_at else None
-        }
-
-@app.route('/api/unavailable-mfi/status', methods=['POST'])
+@api.route('/api/unavailable-mfi/status', methods=['POST'])
 def update_mfi_status():
     try:
         data = request.get_json()
@@ -204,137 +286,262 @@ def update_mfi_status():
         new_status = data.get('Status')
         if not mfi_name or not new_status:
             return jsonify({'error': 'MFI name and Status are required'}), 400
-        mfi = Biller.query.filter_by(name=mfi_name, category='MFI').first()
+        if new_status not in STATUSES:
+            return jsonify({'error': 'Invalid status'}), 400
+        mfi = lock_billers(Biller.query.filter_by(name=mfi_name, category='MFI')).first()
         if not mfi:
             return jsonify({'error': 'MFI not found'}), 404
         old_status = mfi.status
         mfi.status = new_status
+        # Counters and history are written in the same transaction
+        status_history = record_status_change(mfi, old_status)
+        bump_data_version()
         db.session.commit()
-        # Record the status change in database (history)
-        status_history = MFIStatusHistory(
-            mfi_name=mfi_name,
-            old_status=old_status,
-            new_status=new_status
-        )
-        db.session.add(status_history)
-        db.session.commit()
+        publish_status_change(mfi, old_status)
         # Get updated dashboard counts if status changed to/from 'go_live'
         dashboard_data = None
         if new_status == 'go_live' or old_status == 'go_live':
-            total_billers = db.session.query(Biller).count()
-            unavailable_isp = db.session.query(Biller).filter_by(category='ISP').filter(Biller.status != 'go_live').count()
-            unavailable_mfi = db.session.query(Biller).filter_by(category='MFI').filter(Biller.status != 'go_live').count()
-            last_updated = db.session.query(db.func.max(Biller.onboard_date)).scalar()
-            dashboard_data = {
-                'target_count': total_billers,
-                'unavailable_isp': unavailable_isp,
-                'unavailable_mfi': unavailable_mfi,
-                'last_updated': last_updated.isoformat() if last_updated else None
-            }
+            dashboard_data = dashboard_overview()
         return jsonify({
             'success': True,
             'message': f'Status updated for MFI: {mfi_name}',
-            'history': status_history.to_dict(),
+            'history': status_history.to_dict() if status_history else None,
             'dashboard': dashboard_data
         })
     except Exception as e:
+        db.session.rollback()
         logger.error(f'Unexpected error: {str(e)}', exc_info=True)
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/biller-status')
+@api.route('/api/biller-status')
 def get_biller_status():
     category = request.args.get('category')
-    query = db.session.query(Biller)
-    
-    if category and category.lower() != 'all':
-        query = query.filter_by(category=category)
-    
-    status_counts = {
-        'not_started': query.filter_by(status='not_started').count(),
-        'in_progress': query.filter_by(status='in_progress').count(),
-        'go_live': query.filter_by(status='go_live').count()
-    }
-    
-    return jsonify(status_counts)
-
-@app.route('/api/top-50-status')
+    if not category or category.lower() == 'all':
+        category = None
+    return jsonify(status_counts(category=category))
+
+@api.route('/api/top-50-status')
 def get_top_50_status():
     try:
         category = request.args.get('category')
-        query = Biller.query.filter_by(is_top_50=True)
-        if category and category.lower() != 'all':
-            query = query.filter(Biller.category.ilike(category))
-        billers = query.all()
-        status_counts = {
-            'not_started': 0,
-            'in_progress': 0,
-            'go_live': 0
-        }
-        for b in billers:
-            if b.status in status_counts:
-                status_counts[b.status] += 1
-        return jsonify(status_counts)
+        if not category or category.lower() == 'all':
+            category = None
+        return jsonify(status_counts(category=category, is_top_50=True, ignore_case=True))
     except Exception as e:
         logger.error(f'Error in get_top_50_status: {e}')
         return jsonify({'not_started': 0, 'in_progress': 0, 'go_live': 0}), 500
 
-@app.route('/api/categories')
+@api.route('/api/categories')
+@cached_response('categories')
 def get_categories():
     categories = db.session.query(Biller.category).distinct().all()
     return jsonify(['all'] + [category[0] for category in categories])
 
-@app.route('/api/billers')
+def fts_enabled():
+    """Whether the biller_fts index exists, checked once per app."""
+    enabled = current_app.extensions.get('biller_fts')
+    if enabled is None:
+        enabled = current_app.extensions['biller_fts'] = search.fts_available(db.session.connection())
+    return enabled
+
+BILLER_FIELDS = ('id', 'name', 'category', 'status', 'is_top_50', 'onboard_date', 'notes', 'web')
+BILLER_PAGE_MAX = 1000
+BILLER_STREAM_BATCH = 500
+
+def apply_biller_filters(query, args):
+    """Apply the category/status/is_top_50/search filters used by /api/billers."""
+    category = args.get('category')
+    status = args.get('status')
+    is_top_50 = args.get('is_top_50')
+    search_term = args.get('search', '').strip()
+
+    if category and category.lower() != 'all':
+        query = query.filter(Biller.category == category)
+
+    if status and status.lower() != 'all':
+        query = query.filter(Biller.status == status)
+
+    if is_top_50 and is_top_50.lower() == 'true':
+        query = query.filter(Biller.is_top_50 == True)
+
+    if search_term:
+        match_query = search.build_match_query(search_term) if fts_enabled() else None
+        if match_query:
+            query = query.filter(Biller.id.in_(search.matching_ids(match_query)))
+        else:
+            search_pattern = f'%{search_term}%'
+            query = query.filter(Biller.name.ilike(search_pattern))
+    return query
+
+def parse_biller_fields(raw_fields):
+    """Turn a ``fields=`` argument into a tuple of Biller column names."""
+    if not raw_fields:
+        return BILLER_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw_fields.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in BILLER_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return fields or BILLER_FIELDS
+
+def encode_cursor(name, biller_id):
+    payload = json.dumps([name, biller_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        name, biller_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(name), int(biller_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def serialize_biller_row(fields, row):
+    record = {}
+    for field, value in zip(fields, row):
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        record[field] = value
+    return record
+
+@api.route('/api/billers')
 def get_billers():
+    """List billers ordered by (name, id).
+
+    Without ``limit`` or ``cursor`` the whole filtered list is streamed in
+    batches. With them, one keyset page is returned together with
+    ``next_cursor``. ``fields=`` selects a subset of columns and
+    ``format=ndjson`` emits one JSON object per line instead of a document.
+    """
+    try:
+        fields = parse_biller_fields(request.args.get('fields'))
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
+        ndjson = request.args.get('format') == 'ndjson'
+
+        # Always select name and id so the next cursor can be built
+        columns = [getattr(Biller, f) for f in fields]
+        query = apply_biller_filters(db.session.query(*columns, Biller.name, Biller.id), request.args)
+        query = query.order_by(Biller.name, Biller.id)
+
+        paginate = cursor is not None or limit is not None
+        next_cursor = None
+        if paginate:
+            limit = max(1, min(limit or BILLER_PAGE_MAX, BILLER_PAGE_MAX))
+            if cursor:
+                last_name, last_id = decode_cursor(cursor)
+                query = query.filter(db.tuple_(Biller.name, Biller.id) > (last_name, last_id))
+            rows = query.limit(limit + 1).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+        else:
+            rows = query.yield_per(BILLER_STREAM_BATCH)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+    width = len(fields)
+
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(serialize_biller_row(fields, row[:width])) + '\n'
+
+    def generate_json():
+        total = 0
+        yield '{"success": true, "data": ['
+        for row in rows:
+            yield (',' if total else '') + json.dumps(serialize_biller_row(fields, row[:width]))
+            total += 1
+        yield '], "total": %d, "next_cursor": %s}' % (total, json.dumps(next_cursor))
+
+    if ndjson:
+        response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    else:
+        response = Response(stream_with_context(generate_json()), mimetype='application/json')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # Spreadsheets would evaluate it as a formula, keep it as text
+        return "'" + value
+    return value
+
+def _export_csv(fields, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(fields)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(_csv_cell(value) for value in row)
+        if count % BILLER_STREAM_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@api.route('/api/billers/export')
+def export_billers():
+    """Download the billers matching the /api/billers filters as CSV or XLSX.
+
+    ``format`` is ``csv`` (default) or ``xlsx`` and ``fields=`` picks the
+    columns. Rows are read in ``yield_per`` batches and written straight to
+    the response.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'success': False, 'error': f'format must be one of {", ".join(EXPORT_MIMETYPES)}'}), 400
+    try:
+        fields = parse_biller_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    columns = [getattr(Biller, f) for f in fields]
+    query = apply_biller_filters(db.session.query(*columns), request.args).order_by(Biller.name, Biller.id)
+    rows = query.yield_per(BILLER_STREAM_BATCH)
+    if export_format == 'csv':
+        body = _export_csv(fields, rows)
+    else:
+        body = stream_workbook(fields, rows)
+    filename = f"billers-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    response = Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@api.route('/api/billers/typeahead')
+def get_biller_typeahead():
+    term = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
     try:
-        print('Checking database location:', app.instance_path)
-        print('Database URI:', app.config['SQLALCHEMY_DATABASE_URI'])
-        total_count = db.session.query(Biller).count()
-        print('Total billers in database:', total_count)
-        
-        # Get a sample of billers to verify data
-        sample = db.session.query(Biller).limit(5).all()
-        print('Sample billers:')
-        for biller in sample:
-            print(f'  - {biller.name} ({biller.status})')
-        # Get query parameters
-        category = request.args.get('category')
-        status = request.args.get('status')
-        is_top_50 = request.args.get('is_top_50')
-        search = request.args.get('search', '').strip()
-        
-        # Start with base query
-        query = db.session.query(Biller)
-        
-        # Apply filters
-        if category and category.lower() != 'all':
-            query = query.filter_by(category=category)
-        
-        if status and status.lower() != 'all':
-            query = query.filter_by(status=status)
-        
-        if is_top_50 and is_top_50.lower() == 'true':
-            query = query.filter_by(is_top_50=True)
-            
-        if search:
-            search_pattern = f'%{search}%'
-            query = query.filter(Biller.name.ilike(search_pattern))
-        
-        # Order by name
-        query = query.order_by(Biller.name)
-        
-        billers = query.all()
         return jsonify({
             'success': True,
-            'total': len(billers),
-            'data': [biller.to_dict() for biller in billers]
+            'data': search.typeahead(db.session.connection(), term, limit)
         })
     except Exception as e:
+        logger.error(f'Exception in /api/billers/typeahead: {e}')
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/billers/<int:biller_id>/status', methods=['POST'])
+@api.route('/api/billers/<int:biller_id>/status', methods=['POST'])
 def update_biller_status(biller_id):
     try:
         data = request.get_json()
@@ -346,21 +553,25 @@ def update_biller_status(biller_id):
                 'error': 'Status is required'
             }), 400
             
-        if new_status not in ['not_started', 'in_progress', 'go_live']:
+        if new_status not in STATUSES:
             return jsonify({
                 'success': False,
                 'error': 'Invalid status'
             }), 400
         
-        biller = db.session.query(Biller).get(biller_id)
+        biller = lock_billers(Biller.query.filter_by(id=biller_id)).first()
         if not biller:
             return jsonify({
                 'success': False,
                 'error': 'Biller not found'
             }), 404
         
+        old_status = biller.status
         biller.status = new_status
+        record_status_change(biller, old_status)
+        bump_data_version()
         db.session.commit()
+        publish_status_change(biller, old_status)
         
         return jsonify({
             'success': True,
@@ -374,7 +585,20 @@ def update_biller_status(biller_id):
             'error': str(e)
         }), 500
 
-@app.route('/api/unavailable-isp/status', methods=['POST'])
+# Status labels used in the Excel workbooks
+EXCEL_STATUS_LABELS = {
+    'not_started': 'Not Started',
+    'in_progress': 'In Progress',
+    'go_live': 'Go Live'
+}
+
+def _isp_workbook_rows(app):
+    with app.app_context():
+        rows = db.session.query(Biller.name, Biller.web, Biller.status) \
+            .filter(Biller.category == 'ISP').order_by(Biller.name).all()
+    return [(name, web or '', EXCEL_STATUS_LABELS.get(status, status)) for name, web, status in rows]
+
+@api.route('/api/unavailable-isp/status', methods=['POST'])
 def update_isp_status():
     try:
         data = request.get_json()
@@ -384,113 +608,460 @@ def update_isp_status():
         if not isp_name or not new_status:
             return jsonify({'error': 'ISP name and Status are required'}), 400
             
-        # Convert status to title case for Excel
-        status_mapping = {
-            'not_started': 'Not Started',
-            'in_progress': 'In Progress',
-            'go_live': 'Go Live'
-        }
-        
-        if new_status not in status_mapping:
+        if new_status not in EXCEL_STATUS_LABELS:
             return jsonify({'error': 'Invalid status'}), 400
         
-        excel_status = status_mapping[new_status]
-        
-        # Read the Excel file
-        try:
-            df = pd.read_excel(ISP_EXCEL_FILE)
-        except Exception as e:
-            logger.error(f'Failed to read {ISP_EXCEL_FILE}, trying notisp.xlsx')
-            df = pd.read_excel('notisp.xlsx')
-            
-        df.columns = df.columns.str.strip()
+        excel_status = EXCEL_STATUS_LABELS[new_status]
         
-        # Find the ISP and update its status
-        isp_mask = df['ISP'].astype(str) == str(isp_name)
-        if not isp_mask.any():
+        # The database is the system of record, noti.xlsx is exported in the background
+        biller = lock_billers(Biller.query.filter_by(name=isp_name, category='ISP')).first()
+        if not biller:
             return jsonify({'error': 'ISP not found'}), 404
             
-        # Get the old status before updating
-        old_status = df.loc[isp_mask, 'Status'].iloc[0]
-        
-        # Update status in Excel
-        df.loc[isp_mask, 'Status'] = excel_status
-        df.to_excel(ISP_EXCEL_FILE, index=False)
-
-        # Update status in the database as well
-        biller = Biller.query.filter_by(name=isp_name, category='ISP').first()
-        if biller:
-              biller.status = new_status  # Use the API value (e.g., 'not_started')
-              db.session.commit()
-        else:
-              logger.warning(f"No Biller found in DB for ISP '{isp_name}' with category 'ISP'")
-
-        # Record the status change in database (history)
-        status_history = ISPStatusHistory(
-            isp_name=isp_name,
-            old_status=old_status,
-            new_status=excel_status
-        )
-        db.session.add(status_history)
+        biller_old_status = biller.status
+        old_status = EXCEL_STATUS_LABELS.get(biller_old_status, biller_old_status)
+        biller.status = new_status  # Use the API value (e.g., 'not_started')
+        # Counters and history are written in the same transaction
+        status_history = record_status_change(biller, biller_old_status)
+        bump_data_version()
         db.session.commit()
+        publish_status_change(biller, biller_old_status)
+        current_app.extensions['isp_workbook_exporter'].schedule()
         
         # Get updated dashboard counts if status changed to/from 'Go Live'
         dashboard_data = None
         if excel_status == 'Go Live' or old_status == 'Go Live':
-            # Get fresh dashboard data since counts have changed
-            total_billers = db.session.query(Biller).count()
-            unavailable_isp = len(df[df['Status'] != 'Go Live'])
-            # Count MFIs that are not in 'Go Live' status from Excel file
-            try:
-                df_mfi = pd.read_excel('mfi.xlsx')
-                unavailable_mfi = len(df_mfi[df_mfi['Status'] != 'Go Live'])
-            except Exception as e:
-                logger.error(f'Error counting unavailable MFIs: {e}')
-                unavailable_mfi = 0
-            last_updated = db.session.query(db.func.max(Biller.onboard_date)).scalar()
-            
-            dashboard_data = {
-                'target_count': total_billers,
-                'unavailable_isp': unavailable_isp,
-                'unavailable_mfi': unavailable_mfi,
-                'last_updated': last_updated.isoformat() if last_updated else None
-            }
+            dashboard_data = dashboard_overview()
         
         return jsonify({
             'success': True,
             'message': f'Status updated for ISP: {isp_name}',
-            'history': status_history.to_dict(),
+            'history': status_history.to_dict() if status_history else None,
             'dashboard': dashboard_data  # Will be None if no dashboard update needed
         })
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f'Exception in /api/unavailable-isp/status: {e}')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/unavailable-isp/history', methods=['GET'])
+BATCH_MAX_ITEMS = 500
+
+def _parse_batch_item(item):
+    """Validate one batch item, returning (key, status, onboard_date, error)."""
+    if not isinstance(item, dict):
+        return None, None, None, 'Item must be an object'
+    status = item.get('status') or item.get('Status')
+    if status not in STATUSES:
+        return None, None, None, 'Invalid status'
+    if item.get('id') is not None:
+        try:
+            key = ('id', int(item['id']))
+        except (TypeError, ValueError):
+            return None, None, None, 'Invalid id'
+    elif item.get('name') and item.get('category'):
+        key = ('name', (str(item['name']), str(item['category'])))
+    else:
+        return None, None, None, 'Either id or name and category are required'
+    onboard_date = None
+    if item.get('onboarding_date'):
+        try:
+            onboard_date = datetime.strptime(item['onboarding_date'], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return None, None, None, 'onboarding_date must be YYYY-MM-DD'
+    return key, status, onboard_date, None
+
+@api.route('/api/billers/status:batch', methods=['POST'])
+def update_biller_status_batch():
+    """Apply many status changes in one transaction.
+
+    Accepts ``{"items": [...]}`` (or a bare list) where each item has
+    ``status``, either ``id`` or ``name`` and ``category``, and an optional
+    ``onboarding_date``. Every item is validated first; if any fails
+    nothing is written.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'items must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_ITEMS} items per batch'}), 400
+
+    try:
+        parsed = [_parse_batch_item(item) for item in items]
+
+        # Resolve every referenced biller with at most two queries. The rows
+        # stay locked until commit, so the old statuses read here are the
+        # ones the counters are moved from
+        columns = (Biller.id, Biller.name, Biller.category, Biller.is_top_50, Biller.status, Biller.onboard_date)
+        ids = {key[1] for key, _, _, error in parsed if not error and key[0] == 'id'}
+        names = {key[1] for key, _, _, error in parsed if not error and key[0] == 'name'}
+        by_id = {}
+        by_name = {}
+        if ids:
+            for row in lock_billers(db.session.query(*columns).filter(Biller.id.in_(ids))):
+                by_id[row.id] = row
+        if names:
+            rows = lock_billers(db.session.query(*columns).filter(db.tuple_(Biller.name, Biller.category).in_(names))
+                                .order_by(Biller.id))
+            for row in rows:
+                by_name.setdefault((row.name, row.category), row)
+
+        results = []
+        targets = {}
+        for index, (key, status, onboard_date, error) in enumerate(parsed):
+            row = None
+            if not error:
+                row = by_id.get(key[1]) if key[0] == 'id' else by_name.get(key[1])
+                if row is None:
+                    error = 'Biller not found'
+                elif row.id in targets:
+                    error = 'Biller appears more than once in the batch'
+            if error:
+                results.append({'index': index, 'success': False, 'error': error})
+                continue
+            targets[row.id] = (row, status, onboard_date)
+            results.append({'index': index, 'success': True, 'id': row.id, 'name': row.name,
+                            'category': row.category, 'old_status': row.status, 'status': status})
+
+        if any(not result['success'] for result in results):
+            return jsonify({'success': False, 'error': 'Validation failed, nothing was updated',
+                            'results': results}), 400
+
+        # Bulk UPDATE, history rows and counter deltas, then a single commit
+        table = Biller.__table__
+        status_updates = []
+        dated_updates = []
+        history_rows = []
+        deltas = {}
+        changes = []
+        now = datetime.utcnow()
+        for row, status, onboard_date in targets.values():
+            params = {'b_id': row.id, 'b_status': status}
+            if onboard_date:
+                params['b_onboard_date'] = onboard_date
+                dated_updates.append(params)
+            elif status != row.status:
+                status_updates.append(params)
+            if status == row.status:
+                continue
+            bucket = (row.category, bool(row.is_top_50))
+            old_delta, old_latest = deltas.get(bucket + (row.status,), (0, None))
+            deltas[bucket + (row.status,)] = (old_delta - 1, old_latest)
+            new_delta, new_latest = deltas.get(bucket + (status,), (0, None))
+            moved_date = onboard_date or row.onboard_date
+            if moved_date and (new_latest is None or moved_date > new_latest):
+                new_latest = moved_date
+            deltas[bucket + (status,)] = (new_delta + 1, new_latest)
+            changes.append((row.id, row.name, row.category, row.is_top_50, row.status, status))
+            history_rows.append({'biller_id': row.id, 'biller_name': row.name, 'category': row.category,
+                                 'old_status': row.status, 'new_status': status, 'changed_at': now})
+
+        if status_updates:
+            db.session.connection().execute(
+                table.update().where(table.c.id == db.bindparam('b_id'))
+                .values(status=db.bindparam('b_status')),
+                status_updates
+            )
+        if dated_updates:
+            db.session.connection().execute(
+                table.update().where(table.c.id == db.bindparam('b_id'))
+                .values(status=db.bindparam('b_status'), onboard_date=db.bindparam('b_onboard_date')),
+                dated_updates
+            )
+        if history_rows:
+            db.session.execute(StatusHistory.__table__.insert(), history_rows)
+            cube_deltas = {}
+            for history in history_rows:
+                cube_key = (history['category'], history['new_status'])
+                cube_deltas[cube_key] = cube_deltas.get(cube_key, 0) + 1
+            for (category, status), delta in cube_deltas.items():
+                _add_to_status_cube(category, status, now, delta)
+        for (category, is_top_50, status), (delta, latest) in deltas.items():
+            if delta or latest:
+                _adjust_status_counter(category, is_top_50, status, delta, latest)
+        if dated_updates:
+            # An edited date may have been the latest one, recompute them
+            refresh_status_counter_dates()
+        if changes or dated_updates:
+            bump_data_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Exception in /api/billers/status:batch: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    publish_status_changes(changes)
+    if any(change[2] == 'ISP' for change in changes):
+        current_app.extensions['isp_workbook_exporter'].schedule()
+    return jsonify({
+        'success': True,
+        'updated': len(changes),
+        'results': results,
+        'dashboard': dashboard_overview()
+    })
+
+# Name column of the workbooks usually uploaded for each category
+IMPORT_NAME_COLUMNS = {'ISP': 'ISP', 'MFI': 'MFI'}
+
+@api.route('/api/imports', methods=['POST'])
+def create_import():
+    """Queue an uploaded workbook for import and return its job with 202.
+
+    Multipart form with the workbook in ``file`` and its ``category``;
+    ``name_col`` (default ``ISP``/``MFI`` for those categories, else
+    ``Biller Name``), ``status_col`` (default ``Status``) and ``web_col``
+    (default ``Web``) name its columns. Answers 429 while the import
+    queue is full. Poll ``GET /api/imports/<id>`` for progress.
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'error': 'file is required'}), 400
+    # Keep the client's name for display and re-import detection; the file
+    # is stored under a generated name, since secure_filename() would strip
+    # a non-ASCII name such as a Burmese one down to "xlsx"
+    filename = os.path.basename(upload.filename.replace('\\', '/'))[-255:]
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in imports.ALLOWED_EXTENSIONS:
+        return jsonify({'success': False, 'error': 'file must be an .xlsx workbook'}), 400
+    category = (request.form.get('category') or '').strip()
+    if not category:
+        return jsonify({'success': False, 'error': 'category is required'}), 400
+
+    queue = current_app.extensions['import_queue']
+    if not queue.reserve():
+        response = jsonify({'success': False, 'error': 'Too many imports in progress, try again later'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    try:
+        upload_dir = current_app.config['UPLOAD_DIR']
+        os.makedirs(upload_dir, exist_ok=True)
+        path = os.path.join(upload_dir, f'{uuid.uuid4().hex}{extension}')
+        upload.save(path)
+        job = ImportJob(
+            filename=filename,
+            path=path,
+            category=category,
+            name_col=request.form.get('name_col') or IMPORT_NAME_COLUMNS.get(category, 'Biller Name'),
+            status_col=request.form.get('status_col') or 'Status',
+            web_col=request.form.get('web_col') or 'Web',
+            state='queued'
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        queue.release()
+        db.session.rollback()
+        logger.error(f'Exception in /api/imports: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    queue.submit(job.id)
+    response = jsonify({'success': True, 'data': job.to_dict()})
+    response.headers['Location'] = f'/api/imports/{job.id}'
+    return response, 202
+
+@api.route('/api/imports/<int:job_id>', methods=['GET'])
+def get_import(job_id):
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Import not found'}), 404
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+HISTORY_PAGE_DEFAULT = 100
+HISTORY_PAGE_MAX = 1000
+
+def _parse_history_time(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an ISO date or datetime')
+
+def query_status_history(args, category=None, name=None):
+    """Return one page of status history, newest first, and the next cursor.
+
+    Supports ``biller_id``, ``category``, ``since``/``until`` (ISO dates,
+    ``until`` exclusive), ``limit`` and ``cursor``. Pages are keyset
+    paginated on (changed_at, id) so deep pages cost the same as the first.
+    """
+    limit = max(1, min(args.get('limit', HISTORY_PAGE_DEFAULT, type=int), HISTORY_PAGE_MAX))
+    query = db.session.query(StatusHistory)
+    if args.get('biller_id'):
+        query = query.filter(StatusHistory.biller_id == args.get('biller_id', type=int))
+    category = category or args.get('category')
+    if category and category.lower() != 'all':
+        query = query.filter(StatusHistory.category == category)
+    if name:
+        query = query.filter(StatusHistory.biller_name == name)
+    if args.get('since'):
+        query = query.filter(StatusHistory.changed_at >= _parse_history_time(args['since'], 'since'))
+    if args.get('until'):
+        query = query.filter(StatusHistory.changed_at < _parse_history_time(args['until'], 'until'))
+    if args.get('cursor'):
+        changed_at, history_id = decode_cursor(args['cursor'])
+        query = query.filter(
+            db.tuple_(StatusHistory.changed_at, StatusHistory.id)
+            < (_parse_history_time(changed_at, 'cursor'), history_id)
+        )
+    rows = query.order_by(StatusHistory.changed_at.desc(), StatusHistory.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].changed_at.isoformat(), rows[-1].id)
+    return rows, next_cursor
+
+@api.route('/api/status-history', methods=['GET'])
+def get_status_history():
+    try:
+        rows, next_cursor = query_status_history(request.args)
+        return jsonify({
+            'success': True,
+            'data': [item.to_dict() for item in rows],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Exception in /api/status-history: {e}')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/unavailable-isp/history', methods=['GET'])
 def get_isp_status_history():
     try:
-        # Get query parameters
-        isp_name = request.args.get('isp')
-        
-        # Build query
-        query = db.session.query(ISPStatusHistory)
-        if isp_name:
-            query = query.filter(ISPStatusHistory.isp_name == isp_name)
-            
-        # Order by most recent first
-        query = query.order_by(ISPStatusHistory.changed_at.desc())
-        
-        # Get results
-        history = query.all()
-        
+        rows, next_cursor = query_status_history(request.args, category='ISP', name=request.args.get('isp'))
+        data = []
+        for item in rows:
+            record = item.to_dict()
+            record['isp_name'] = item.biller_name
+            data.append(record)
         return jsonify({
             'success': True,
-            'data': [item.to_dict() for item in history]
+            'data': data,
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f'Exception in /api/unavailable-isp/history: {e}')
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/heatmap', methods=['GET'])
+def get_heatmap():
+    """Dense category x status x month counts of status changes.
+
+    ``since`` and ``until`` are inclusive months in YYYY-MM form.
+    """
+    try:
+        bounds = {}
+        for name in ('since', 'until'):
+            value = request.args.get(name)
+            if value:
+                try:
+                    # Periods compare as strings, so pass them zero-padded
+                    value = datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+                except ValueError:
+                    raise ValueError(f'{name} must be in YYYY-MM format')
+            bounds[name] = value
+        data = heatmap.cube_matrix(db.session.connection(), bounds['since'], bounds['until'])
+        return jsonify({'success': True, 'data': data})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Exception in /api/heatmap: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+analytics_cache = analytics.AnalyticsCache()
+
+@api.route('/api/analytics/onboarding', methods=['GET'])
+def get_onboarding_analytics():
+    """Weekly (or daily/monthly) throughput and cycle time from status history."""
+    try:
+        category = request.args.get('category')
+        if not category or category.lower() == 'all':
+            category = None
+        bucket = request.args.get('bucket', 'week')
+        if bucket not in analytics.BUCKETS:
+            raise ValueError(f'bucket must be one of {", ".join(analytics.BUCKETS)}')
+        since = _parse_history_time(request.args['since'], 'since') if request.args.get('since') else None
+        until = _parse_history_time(request.args['until'], 'until') if request.args.get('until') else None
+
+        conn = db.session.connection()
+        key = (category, bucket, since, until)
+        watermark = analytics.history_watermark(conn)
+        result = analytics_cache.get(key, watermark)
+        if result is None:
+            result = analytics.onboarding_metrics(conn, category, bucket, since, until)
+            analytics_cache.put(key, watermark, result)
+        return jsonify({'success': True, 'data': result})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Exception in /api/analytics/onboarding: {e}', exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def create_schema():
+    """Create missing tables and apply pending migrations; needs an app context.
+
+    Run once per deployment (create_schema.py, serve.py, init scripts), not
+    on every import or worker start. Returns the migration versions applied.
+    """
+    db.create_all()
+    applied = run_migrations(db.engine)
+    # One GROUP BY; repairs counters cleared or left out of step by a
+    # maintenance script
+    rebuild_status_counters()
+    db.session.commit()
+    return applied
+
+def create_app(test_config=None):
+    """Build the Flask app. Does not touch the database."""
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+    app = Flask(__name__)
+    CORS(app)
+    CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin"], "expose_headers": ["Content-Type", "X-Total-Count", "X-Next-Cursor", "ETag", "Last-Modified", "Content-Disposition"]}}, supports_credentials=True)
+
+    # Database Configuration, see config.py for the environment variables
+    database_uri = config.database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Several server threads or workers share the database. The pool keeps a
+    # handful of connections open and, on SQLite, the busy timeout makes
+    # writers wait for a lock instead of failing with "database is locked".
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.engine_options(database_uri)
+    # Exported next to the database, never over the tracked noti.xlsx that
+    # migrate_excel_to_sql.py imports from
+    app.config['ISP_EXCEL_FILE'] = os.environ.get(
+        'ISP_EXCEL_FILE', os.path.join(os.path.dirname(BASE_DIR), 'instance', 'exports', 'noti.xlsx')
+    )
+    app.config['UPLOAD_DIR'] = os.environ.get('UPLOAD_DIR', os.path.join(os.path.dirname(BASE_DIR), 'uploads'))
+    # Uploads larger than this are refused with 413 before they are read
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('IMPORT_MAX_BYTES', 50 * 1024 * 1024))
+    if test_config:
+        app.config.update(test_config)
+
+    # Ensure instance directory exists
+    sqlite_path = config.sqlite_path(app.config['SQLALCHEMY_DATABASE_URI'])
+    if sqlite_path:
+        os.makedirs(os.path.dirname(sqlite_path), exist_ok=True)
+    db.init_app(app)
+    if not event.contains(Engine, 'connect', configure_sqlite_connection):
+        event.listen(Engine, 'connect', configure_sqlite_connection)
+
+    # Opt-in latency/query metrics on /metrics (METRICS_ENABLED=1), see metrics.py
+    metrics.install_from_env(app, os.path.join(os.path.dirname(BASE_DIR), 'instance', 'profiles'))
+
+    app.extensions['response_cache'] = read_cache.ResponseCache.from_env()
+    app.extensions['event_broker'] = events.EventBroker.from_env()
+    logger.info(f"ISP Excel file path: {app.config['ISP_EXCEL_FILE']}")
+    app.extensions['isp_workbook_exporter'] = WorkbookExporter(
+        app.config['ISP_EXCEL_FILE'], ('ISP', 'Web', 'Status'), lambda: _isp_workbook_rows(app)
+    )
+    app.extensions['import_queue'] = imports.ImportQueue.from_env(app)
+    app.register_blueprint(api)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server only; use serve.py in production
+    app = create_app()
+    with app.app_context():
+        create_schema()
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1')
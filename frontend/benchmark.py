@@ -0,0 +1,474 @@
+"""Latency and throughput benchmark for every API route.
+
+Two ways to drive the app:
+
+* ``--mode client`` (default) imports the app and calls it through the
+  Flask test client. SQL statements per request are counted with
+  SQLAlchemy events. This measures the code without any network or server
+  overhead and is the mode to use when comparing commits.
+* ``--mode http`` sends real requests to a running server (``--url``),
+  for example ``python serve.py``. Query counts come from the
+  ``Server-Timing`` header, so start the server with METRICS_ENABLED=1 to
+  get them.
+
+Every scenario is run ``--requests`` times spread over ``--concurrency``
+threads, after ``--warmup`` untimed requests. The report has p50/p95/p99
+latency, throughput, queries and bytes per request. It is printed as a
+table and written as JSON with ``--output``. ``--compare baseline.json``
+flags routes whose p95 latency grew by more than ``--threshold`` or which
+now run more queries, and exits with status 1 if any did.
+
+Client mode uses instance/benchmark.db by default; fill it first with
+generate_data.py. Write scenarios change statuses in that database. The
+import scenario uploads an ISP workbook with only a header row, so it
+queues jobs without changing any biller. In http mode, start the server
+with a large IMPORT_QUEUE_MAX or most uploads are answered 429.
+
+Usage: python benchmark.py [--mode client|http] [--url http://127.0.0.1:5000]
+                           [--requests 200] [--concurrency 1] [--routes heatmap,categories]
+                           [--no-cache] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+from datetime import datetime
+import http.client
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+import uuid
+
+from generate_data import BENCHMARK_DB
+
+STATUSES = ('not_started', 'in_progress', 'go_live')
+# Routes that are not request/response shaped and are left out on purpose
+SKIPPED_RULES = {
+    '/api/events': 'long-lived event stream',
+    '/metrics': 'instrumentation endpoint',
+    '/static/<path:filename>': 'static files',
+}
+
+
+class Scenario:
+    def __init__(self, name, rule, method='GET', path=None, build=None):
+        self.name = name
+        self.rule = rule
+        self.method = method
+        self._path = path or rule
+        self._build = build
+
+    def request(self, sample, i):
+        """Return (path, json body) for the i-th request."""
+        if self._build is None:
+            return self._path, None
+        return self._build(sample, i)
+
+
+class Upload:
+    """Multipart form body: ``fields`` plus one file in the ``file`` field."""
+
+    def __init__(self, filename, content, fields):
+        self.filename = filename
+        self.content = content
+        self.fields = fields
+
+    def form_data(self):
+        return {**self.fields, 'file': (io.BytesIO(self.content), self.filename)}
+
+    def encode(self):
+        """Return (content type, bytes) for sending over HTTP."""
+        boundary = uuid.uuid4().hex
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            for name, value in self.fields.items()
+        ]
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{self.filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + self.content + b'\r\n'
+        )
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        return f'multipart/form-data; boundary={boundary}', b''.join(parts)
+
+
+def header_only_workbook(headers):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.append(headers)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _nth(items, i):
+    return items[i % len(items)]
+
+
+def _status(i):
+    return STATUSES[i % len(STATUSES)]
+
+
+SCENARIOS = [
+    Scenario('dashboard_overview', '/api/dashboard-overview'),
+    Scenario('top_50_billers', '/api/top-50-billers'),
+    Scenario('unavailable_isp', '/api/unavailable-isp'),
+    Scenario('unavailable_mfi', '/api/unavailable-mfi'),
+    Scenario('biller_status', '/api/biller-status', path='/api/biller-status?category=ISP'),
+    Scenario('top_50_status', '/api/top-50-status'),
+    Scenario('categories', '/api/categories'),
+    Scenario('billers_page', '/api/billers', path='/api/billers?limit=100'),
+    Scenario('billers_search', '/api/billers', path='/api/billers?search=golden%20star&limit=50'),
+    Scenario('billers_stream_category', '/api/billers', path='/api/billers?category=MFI&fields=id,name,status'),
+    Scenario('billers_export_csv', '/api/billers/export', path='/api/billers/export?category=MFI'),
+    Scenario('billers_export_xlsx', '/api/billers/export',
+             path='/api/billers/export?format=xlsx&category=MFI&fields=id,name,status'),
+    Scenario('typeahead', '/api/billers/typeahead', path='/api/billers/typeahead?q=gold'),
+    Scenario('import_upload', '/api/imports', 'POST', build=lambda sample, i: (
+        '/api/imports', sample['import_upload']
+    )),
+    Scenario('import_progress', '/api/imports/<int:job_id>', build=lambda sample, i: (
+        f"/api/imports/{sample['import_job']}", None
+    )),
+    Scenario('status_history', '/api/status-history', path='/api/status-history?limit=100'),
+    Scenario('isp_history', '/api/unavailable-isp/history', path='/api/unavailable-isp/history?limit=100'),
+    Scenario('heatmap', '/api/heatmap'),
+    Scenario('onboarding_analytics', '/api/analytics/onboarding', path='/api/analytics/onboarding?bucket=week'),
+    Scenario('biller_status_update', '/api/billers/<int:biller_id>/status', 'POST', build=lambda sample, i: (
+        f"/api/billers/{_nth(sample['billers'], i)['id']}/status", {'status': _status(i)}
+    )),
+    Scenario('top_50_status_update', '/api/top-50-billers/status', 'POST', build=lambda sample, i: (
+        '/api/top-50-billers/status', {'Biller': _nth(sample['top_50'], i)['name'], 'Status': _status(i)}
+    )),
+    Scenario('isp_status_update', '/api/unavailable-isp/status', 'POST', build=lambda sample, i: (
+        '/api/unavailable-isp/status', {'ISP': _nth(sample['isp'], i)['name'], 'Status': _status(i)}
+    )),
+    Scenario('mfi_status_update', '/api/unavailable-mfi/status', 'POST', build=lambda sample, i: (
+        '/api/unavailable-mfi/status', {'MFI': _nth(sample['mfi'], i)['name'], 'Status': _status(i)}
+    )),
+    Scenario('batch_status_update', '/api/billers/status:batch', 'POST', build=lambda sample, i: (
+        '/api/billers/status:batch',
+        {'items': [{'id': _nth(sample['billers'], i * 20 + j)['id'], 'status': _status(i)} for j in range(20)]}
+    )),
+]
+
+
+class TestClientDriver:
+    """Calls the app in-process and counts SQL statements per request."""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from app import create_app, create_schema
+
+        self.app = create_app()
+        with self.app.app_context():
+            create_schema()
+        self._local = threading.local()
+        event.listen(Engine, 'after_cursor_execute', self._count_query)
+
+    def _count_query(self, *args):
+        self._local.queries = getattr(self._local, 'queries', 0) + 1
+
+    def rules(self):
+        return {rule.rule for rule in self.app.url_map.iter_rules()}
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body):
+            self._local.queries = 0
+            if isinstance(body, Upload):
+                response = client.open(path, method=method, data=body.form_data())
+            else:
+                response = client.open(path, method=method, json=body)
+            data = response.get_data()
+            response.close()
+            return response.status_code, data, self._local.queries
+
+        return send
+
+
+class HttpDriver:
+    """Sends requests to a running server over keep-alive connections."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+
+    def rules(self):
+        return None
+
+    def _connect(self):
+        factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return factory(self.host, self.port, timeout=60)
+
+    def session(self):
+        state = {'conn': self._connect()}
+
+        def send(method, path, body):
+            if isinstance(body, Upload):
+                content_type, payload = body.encode()
+                headers = {'Content-Type': content_type}
+            else:
+                payload = json.dumps(body).encode('utf-8') if body is not None else None
+                headers = {'Content-Type': 'application/json'} if payload is not None else {}
+            for attempt in (1, 2):
+                try:
+                    state['conn'].request(method, path, body=payload, headers=headers)
+                    response = state['conn'].getresponse()
+                    data = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    # The server closed an idle connection, retry once on a new one
+                    state['conn'].close()
+                    state['conn'] = self._connect()
+                    if attempt == 2:
+                        raise
+            if response.will_close:
+                state['conn'].close()
+                state['conn'] = self._connect()
+            return response.status, data, _queries_from_server_timing(response.getheader('Server-Timing'))
+
+        return send
+
+
+def _queries_from_server_timing(header):
+    if not header or 'queries"' not in header:
+        return None
+    try:
+        return int(header.split('desc="', 1)[1].split(' ', 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def load_sample(send):
+    """Fetch billers to aim the write scenarios at."""
+    def billers(query):
+        status, data, _ = send('GET', f'/api/billers?fields=id,name&limit=500{query}', None)
+        if status != 200:
+            raise RuntimeError(f'Could not load sample billers ({status}): {data[:200]!r}')
+        return json.loads(data)['data']
+
+    sample = {
+        'billers': billers(''),
+        'top_50': billers('&is_top_50=true'),
+        'isp': billers('&category=ISP'),
+        'mfi': billers('&category=MFI'),
+    }
+    empty = [name for name, rows in sample.items() if not rows]
+    if empty:
+        raise RuntimeError(f'No billers for {", ".join(empty)}; run generate_data.py first')
+    status, data, _ = send('GET', '/api/dashboard-overview', None)
+    sample['total_billers'] = json.loads(data).get('target_count') if status == 200 else None
+
+    # Same file every time: after the first job, imports are skipped as unchanged
+    sample['import_upload'] = Upload('benchmark-import.xlsx', header_only_workbook(('ISP', 'Web', 'Status')),
+                                     {'category': 'ISP'})
+    status, data, _ = send('POST', '/api/imports', sample['import_upload'])
+    if status != 202:
+        raise RuntimeError(f'Could not queue a sample import ({status}): {data[:200]!r}')
+    sample['import_job'] = json.loads(data)['data']['id']
+    return sample
+
+
+def run_scenario(driver, scenario, sample, requests, concurrency, warmup):
+    send = driver.session()
+    for i in range(warmup):
+        path, body = scenario.request(sample, i)
+        send(scenario.method, path, body)
+
+    latencies = []
+    sizes = []
+    queries = []
+    status_codes = {}
+    lock = threading.Lock()
+    counter = iter(range(warmup, warmup + requests))
+
+    def worker():
+        worker_send = driver.session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            path, body = scenario.request(sample, i)
+            started = time.perf_counter()
+            status, data, query_count = worker_send(scenario.method, path, body)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(len(data))
+                if query_count is not None:
+                    queries.append(query_count)
+                status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return summarize(scenario, latencies, sizes, queries, status_codes, wall)
+
+
+def summarize(scenario, latencies, sizes, queries, status_codes, wall):
+    import numpy as np
+
+    millis = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(millis, [50, 95, 99])
+    return {
+        'method': scenario.method,
+        'rule': scenario.rule,
+        'requests': len(latencies),
+        'errors': sum(count for status, count in status_codes.items() if not status.startswith(('2', '3'))),
+        'status_codes': status_codes,
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(millis.mean()), 3),
+        'max_ms': round(float(millis.max()), 3),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'bytes_per_request': round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def git_revision():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison with ``baseline`` and return the names of regressed routes."""
+    regressed = []
+    print(f"\nCompared with {baseline['meta'].get('commit')} (p95 threshold x{threshold}):")
+    for key in ('mode', 'target', 'concurrency', 'response_cache', 'billers'):
+        if results['meta'].get(key) != baseline['meta'].get(key):
+            print(f"  Warning: {key} differs ({baseline['meta'].get(key)} -> {results['meta'].get(key)}), "
+                  'results may not be comparable')
+    for name, current in results['routes'].items():
+        before = baseline['routes'].get(name)
+        if not before:
+            print(f'  {name:<26} new')
+            continue
+        ratio = current['p95_ms'] / before['p95_ms'] if before['p95_ms'] else float('inf')
+        more_queries = (current['queries_per_request'] or 0) > (before['queries_per_request'] or 0)
+        flag = ''
+        if ratio > threshold or more_queries:
+            flag = '  REGRESSION'
+            regressed.append(name)
+        print(f"  {name:<26} p95 {before['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} ms (x{ratio:.2f})  "
+              f"queries {before['queries_per_request']} -> {current['queries_per_request']}{flag}")
+    return regressed
+
+
+def print_table(results):
+    print(f"{'route':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8} {'bytes':>10}")
+    for name, row in results['routes'].items():
+        queries = '-' if row['queries_per_request'] is None else row['queries_per_request']
+        errors = f"  ({row['errors']} errors)" if row['errors'] else ''
+        print(f"{name:<26} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+              f"{row['throughput_rps']:>9} {queries:>8} {row['bytes_per_request']:>10}{errors}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every API route.')
+    parser.add_argument('--mode', choices=('client', 'http'), default='client')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server to load in http mode')
+    parser.add_argument('--database', default=f'sqlite:///{BENCHMARK_DB}',
+                        help='database used in client mode (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=1, help='parallel clients (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route (default: %(default)s)')
+    parser.add_argument('--routes', help='comma-separated scenario names to run (default: all)')
+    parser.add_argument('--no-cache', action='store_true', help='disable the list response cache (client mode)')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='baseline JSON report to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='p95 ratio above which a route counts as regressed (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == 'client':
+        # The app reads these when it is created
+        os.environ['DATABASE_URL'] = args.database
+        os.environ['ISP_EXCEL_FILE'] = os.path.join(tempfile.gettempdir(), 'benchmark-noti.xlsx')
+        os.environ['UPLOAD_DIR'] = os.path.join(tempfile.gettempdir(), 'benchmark-uploads')
+        # Every import scenario request queues a job; don't answer them 429
+        os.environ.setdefault('IMPORT_QUEUE_MAX', '100000')
+        if args.no_cache:
+            os.environ['READ_CACHE_TTL'] = '0'
+        driver = TestClientDriver()
+    else:
+        driver = HttpDriver(args.url)
+
+    scenarios = SCENARIOS
+    if args.routes:
+        wanted = {name.strip() for name in args.routes.split(',')}
+        unknown = wanted - {scenario.name for scenario in SCENARIOS}
+        if unknown:
+            sys.exit(f'Unknown routes: {", ".join(sorted(unknown))}')
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in wanted]
+
+    rules = driver.rules()
+    if rules is not None:
+        uncovered = rules - {scenario.rule for scenario in SCENARIOS} - set(SKIPPED_RULES)
+        if uncovered:
+            print(f'Warning: no scenario for {", ".join(sorted(uncovered))}', file=sys.stderr)
+
+    sample = load_sample(driver.session())
+    commit, dirty = git_revision()
+    results = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'mode': args.mode,
+            'target': args.url if args.mode == 'http' else args.database,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'response_cache': not args.no_cache,
+            'billers': sample['total_billers'],
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'routes': {},
+    }
+    for scenario in scenarios:
+        results['routes'][scenario.name] = run_scenario(
+            driver, scenario, sample, args.requests, args.concurrency, args.warmup
+        )
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nWrote {args.output}')
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.threshold)
+        if regressed:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
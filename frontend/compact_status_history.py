@@ -0,0 +1,20 @@
+from app import create_app
+from models import db, bump_data_version
+from history import DEFAULT_RETENTION_DAYS, compact_status_history, retention_cutoff
+import argparse
+
+def compact(days=DEFAULT_RETENTION_DAYS):
+    with create_app().app_context():
+        cutoff = retention_cutoff(days)
+        removed = compact_status_history(db.session.connection(), cutoff)
+        if removed:
+            bump_data_version()
+        db.session.commit()
+        print(f'Rolled {removed} status history rows older than {cutoff.date()} into daily summaries.')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact old status history into daily summaries.')
+    parser.add_argument('--days', type=int, default=DEFAULT_RETENTION_DAYS,
+                        help='keep detailed history for this many days (default: %(default)s)')
+    args = parser.parse_args()
+    compact(days=args.days)
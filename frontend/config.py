@@ -0,0 +1,51 @@
+"""Database settings read from the environment.
+
+* ``DATABASE_URL``: SQLAlchemy URL of the database. Defaults to the SQLite
+  file in ``instance/``. ``postgres://`` URLs (as given by most hosts)
+  are accepted and rewritten to ``postgresql://``.
+* ``DB_POOL_SIZE``, ``DB_MAX_OVERFLOW``, ``DB_POOL_TIMEOUT``: connection
+  pool settings, shared by the API and the maintenance scripts.
+"""
+import os
+
+DEFAULT_SQLITE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'instance', 'biller_tracker.db')
+)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+DEFAULT_POOL_TIMEOUT = 30
+# How long SQLite waits for a competing writer before "database is locked"
+SQLITE_BUSY_TIMEOUT_SECONDS = 30
+
+
+def database_uri():
+    uri = os.environ.get('DATABASE_URL', '').strip()
+    if not uri:
+        return f'sqlite:///{DEFAULT_SQLITE_PATH}'
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def sqlite_path(uri):
+    """File path of a SQLite URI, or None for other backends and in-memory databases."""
+    prefix = 'sqlite:///'
+    if not uri.startswith(prefix) or uri == prefix or ':memory:' in uri:
+        return None
+    return uri[len(prefix):].split('?', 1)[0]
+
+
+def engine_options(uri):
+    """Keyword arguments for create_engine, as SQLALCHEMY_ENGINE_OPTIONS."""
+    if uri.startswith('sqlite') and sqlite_path(uri) is None:
+        # In-memory databases live in one connection, keep SQLAlchemy's default pool
+        return {'connect_args': {'check_same_thread': False}}
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)),
+        'pool_pre_ping': True,
+    }
+    if uri.startswith('sqlite'):
+        options['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT_SECONDS, 'check_same_thread': False}
+    return options
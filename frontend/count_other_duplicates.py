@@ -1,12 +1,10 @@
-from app import db, app, Biller
+from app import create_app
+from models import db, Biller
+from dedup import report
 
-with app.app_context():
-    # Find billers where category is 'Other'
-    duplicates = Biller.query.filter(Biller.category == 'Other').all()
-    count = 0
-    for biller in duplicates:
-        # Only count if there is another with the same name and a different category
-        if Biller.query.filter(Biller.name == biller.name, Biller.category != 'Other').first():
-            count += 1
-    print(f"There are {count} remaining duplicates in category 'Other' (with a same-name, different-category counterpart).")
-    print(f"Total 'Other' category records: {len(duplicates)}")
+with create_app().app_context():
+    # Billers in 'Other' that also exist under another category, found in one query
+    result = report(category='Other')
+    total = db.session.query(Biller).filter(Biller.category == 'Other').count()
+    print(f"There are {result['duplicates']} remaining duplicates in category 'Other' (with a same-name, different-category counterpart).")
+    print(f"Total 'Other' category records: {total}")
@@ -1,8 +1,8 @@
-from app import db, MFIStatusHistory, app
+from app import create_app, create_schema
 
 def create_table():
-    with app.app_context():
-        MFIStatusHistory.__table__.create(db.engine, checkfirst=True)
+    with create_app().app_context():
+        create_schema()
         print('MFIStatusHistory table created (if it did not exist).')
 
 if __name__ == '__main__':
@@ -0,0 +1,20 @@
+"""Create the database tables and apply pending migrations.
+
+Run once per deployment, before starting the server (serve.py does this
+itself). Importing or creating the app never touches the schema.
+
+Usage: python create_schema.py
+"""
+from app import create_app, create_schema
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        applied = create_schema()
+        print(f"Database: {app.config['SQLALCHEMY_DATABASE_URI']}")
+        print(f"Schema is up to date (applied migrations: {applied or 'none'}).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Set-based detection and removal of duplicate billers.
+
+Two kinds of duplicates are handled, each found with a single query:
+
+* shadowed: a biller in a catch-all category (``Other`` by default) whose
+  name also exists under another category. The catch-all row is the
+  duplicate.
+* repeated: the same name more than once within one category. Every row
+  after the first (lowest id) is a duplicate.
+
+With ``normalize`` names are compared case-insensitively with surrounding
+whitespace trimmed and inner runs of spaces collapsed. Deletes run as one
+statement inside a transaction and refresh the status counters.
+
+Usage: python dedup.py [--normalize] [--repeated] [--category Other] [--delete]
+"""
+import argparse
+
+from models import db, Biller, bump_data_version, rebuild_status_counters
+import read_cache
+
+
+def name_key(column, normalize=False):
+    """SQL expression used to compare names."""
+    if not normalize:
+        return column
+    folded = db.func.replace(db.func.replace(column, '\t', ' '), '\n', ' ')
+    # Each pass halves runs of spaces, four passes collapse runs of up to 16
+    for _ in range(4):
+        folded = db.func.replace(folded, '  ', ' ')
+    return db.func.lower(db.func.trim(folded))
+
+
+def shadowed_ids(category='Other', normalize=False):
+    """Select ids of ``category`` billers that share a name with another category."""
+    # IN (subquery) is materialized once as a temporary index, which keeps
+    # the normalized comparison O(n log n) instead of a nested loop
+    other = db.aliased(Biller)
+    other_names = db.select(name_key(other.name, normalize)).where(other.category != category)
+    return db.select(Biller.id).where(
+        Biller.category == category,
+        name_key(Biller.name, normalize).in_(other_names)
+    )
+
+
+def repeated_ids(normalize=False):
+    """Select ids of every row after the first for a (name, category) pair."""
+    ranked = db.select(
+        Biller.id,
+        db.func.row_number().over(
+            partition_by=(name_key(Biller.name, normalize), Biller.category),
+            order_by=Biller.id
+        ).label('position')
+    ).subquery()
+    return db.select(ranked.c.id).where(ranked.c.position > 1)
+
+
+def duplicate_ids(repeated=False, category='Other', normalize=False):
+    if repeated:
+        return repeated_ids(normalize)
+    return shadowed_ids(category, normalize)
+
+
+def report(repeated=False, category='Other', normalize=False, sample_size=10):
+    """Count duplicates without changing anything."""
+    ids = duplicate_ids(repeated, category, normalize).subquery()
+    total = db.session.execute(db.select(db.func.count()).select_from(ids)).scalar()
+    sample = db.session.execute(
+        db.select(Biller.id, Biller.name, Biller.category)
+        .where(Biller.id.in_(db.select(ids.c.id)))
+        .order_by(Biller.name, Biller.id)
+        .limit(sample_size)
+    ).all()
+    return {'duplicates': total, 'sample': [tuple(row) for row in sample]}
+
+
+def delete_duplicates(repeated=False, category='Other', normalize=False):
+    """Delete every duplicate in one statement and return the number removed."""
+    try:
+        result = db.session.execute(
+            db.delete(Biller)
+            .where(Biller.id.in_(duplicate_ids(repeated, category, normalize)))
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.rowcount
+        if deleted:
+            rebuild_status_counters()
+            bump_data_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if deleted:
+        read_cache.current().clear()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find and remove duplicate billers.')
+    parser.add_argument('--repeated', action='store_true',
+                        help='find names repeated within a category instead of shadowed catch-all rows')
+    parser.add_argument('--category', default='Other',
+                        help='catch-all category checked for shadowed names (default: %(default)s)')
+    parser.add_argument('--normalize', action='store_true',
+                        help='compare names ignoring case and extra whitespace')
+    parser.add_argument('--delete', action='store_true',
+                        help='delete the duplicates (default is a dry run)')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with create_app().app_context():
+        if args.delete:
+            deleted = delete_duplicates(args.repeated, args.category, args.normalize)
+            print(f'Deleted {deleted} duplicate billers.')
+            return
+        result = report(args.repeated, args.category, args.normalize)
+        print(f"Found {result['duplicates']} duplicate billers (dry run, nothing deleted).")
+        for biller_id, name, category in result['sample']:
+            print(f'  - [{biller_id}] {name} ({category})')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,7 @@
-from app import db, app, Biller
+from app import create_app
+from dedup import delete_duplicates
 
-with app.app_context():
-    # Find billers where category is 'Other'
-    duplicates = Biller.query.filter(Biller.category == 'Other').all()
-    deleted = 0
-    for biller in duplicates:
-        # Only delete if there is another with the same name and a different category
-        if Biller.query.filter(Biller.name == biller.name, Biller.category != 'Other').first():
-            db.session.delete(biller)
-            deleted += 1
-    db.session.commit()
+with create_app().app_context():
+    # Only delete 'Other' billers that have a same-name counterpart in another category
+    deleted = delete_duplicates(category='Other')
     print(f"Deleted {deleted} duplicates in category 'Other'.")
@@ -0,0 +1,60 @@
+"""SQL that differs between SQLite and PostgreSQL.
+
+Everything else in the app is written in the common subset (``ON CONFLICT``
+upserts, window functions, ``CREATE INDEX IF NOT EXISTS``). Only date
+formatting, row locking and the dialect-specific ``insert()`` construct
+live here.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def insert(conn, table):
+    """``INSERT`` construct that supports ``on_conflict_do_update`` on ``conn``'s backend."""
+    if conn.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    if conn.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f'Upserts are not supported on {conn.dialect.name}')
+
+
+def upsert(conn, table, values, keys, update):
+    """Insert ``values`` or, if a row with the same ``keys`` exists, update it.
+
+    ``update(columns, excluded)`` returns the SET clause as a dict, where
+    ``columns`` is the existing row and ``excluded`` the proposed one.
+    Runs as a single statement, so concurrent writers cannot both insert.
+    """
+    stmt = insert(conn, table).values(**values)
+    return conn.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys), set_=update(table.c, stmt.excluded)
+    ))
+
+
+def lock_for_update(conn, query):
+    """Return ``query`` so the rows it reads stay locked until commit.
+
+    PostgreSQL locks the rows with ``SELECT ... FOR UPDATE``. SQLite has no
+    row locks, so the transaction takes the database write lock up front
+    with ``BEGIN IMMEDIATE``; a concurrent writer waits for it (busy
+    timeout) and then reads the committed rows.
+    """
+    if conn.dialect.name != 'sqlite':
+        return query.with_for_update()
+    raw = conn.connection.driver_connection
+    if not raw.in_transaction:
+        raw.execute('BEGIN IMMEDIATE')
+    return query
+
+
+def month_sql(conn, column):
+    """SQL expression formatting a date or timestamp column as 'YYYY-MM'."""
+    if conn.dialect.name == 'postgresql':
+        return f"to_char({column}, 'YYYY-MM')"
+    return f"strftime('%Y-%m', {column})"
+
+
+def day_sql(conn, column):
+    """SQL expression truncating a timestamp column to its date."""
+    if conn.dialect.name == 'postgresql':
+        return f'CAST({column} AS DATE)'
+    return f'date({column})'
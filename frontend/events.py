@@ -0,0 +1,112 @@
+"""Fan-out of status change events to server-sent event subscribers.
+
+Every subscriber owns a bounded queue. Publishing never blocks: when a
+slow client's queue is full its oldest event is dropped and a ``resync``
+event tells the client to refetch instead of trusting its local state.
+
+The broker lives in the process that committed the change, so each
+server process only notifies the clients connected to it.
+
+Every open stream holds a server thread for as long as the client stays
+connected, so the number of subscribers per process is capped
+(``SSE_MAX_SUBSCRIBERS``) and serve.py adds that many threads on top of
+the ones reserved for the API. Beyond the cap ``subscribe`` returns None
+and the API answers 200 with only an SSE ``retry:`` line and closes the
+stream; EventSource treats that as a normal disconnect and reconnects
+after the retry delay, while a non-200 answer would make it give up.
+"""
+import json
+import os
+import queue
+import threading
+
+DEFAULT_BUFFER_SIZE = 100
+DEFAULT_MAX_SUBSCRIBERS = 32
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 15000
+
+
+class Subscription:
+    def __init__(self, broker, buffer_size):
+        self._broker = broker
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.lagged = False
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    @classmethod
+    def from_env(cls):
+        return cls(max_subscribers=int(os.environ.get('SSE_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS)))
+
+    def subscribe(self):
+        """Return a new Subscription, or None when ``max_subscribers`` are connected."""
+        subscription = Subscription(self, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Queue one event for every subscriber, serialized once."""
+        message = format_event(event_type, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                # Drop the oldest event and ask the client to resync
+                subscription.lagged = True
+                try:
+                    subscription.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    subscription.queue.put_nowait(message)
+                except queue.Full:
+                    pass
+
+    def stream(self, subscription):
+        """Yield SSE messages for a subscription until the client disconnects."""
+        try:
+            yield format_event('ready', {'subscribers': self.subscriber_count})
+            while True:
+                try:
+                    message = subscription.queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if subscription.lagged:
+                    subscription.lagged = False
+                    yield format_event('resync', {})
+                yield message
+        finally:
+            subscription.close()
+
+
+def format_retry(milliseconds=RETRY_MILLISECONDS):
+    """SSE body telling an EventSource to reconnect after ``milliseconds``."""
+    return f'retry: {milliseconds}\n\n'
+
+
+def format_event(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
@@ -0,0 +1,163 @@
+"""Background export of database state to the legacy Excel workbooks.
+
+The database is the system of record. Workbooks such as noti.xlsx are
+regenerated off the request path: write endpoints call ``schedule()``,
+changes arriving close together are batched behind a debounce, and the
+workbook is written to a temporary file and renamed over the old one so
+readers never see a half-written file.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WorkbookExporter:
+    """Debounced writer for one workbook.
+
+    ``fetch_rows`` is called from the exporter thread and must return an
+    iterable of row tuples matching ``headers``. An export runs once no new
+    change has been scheduled for ``delay`` seconds, or at the latest
+    ``max_delay`` seconds after the first pending change.
+    """
+
+    def __init__(self, path, headers, fetch_rows, delay=2.0, max_delay=30.0):
+        self.path = path
+        self.headers = tuple(headers)
+        self.fetch_rows = fetch_rows
+        self.delay = delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._first_change = None
+        self._last_change = None
+        self._thread = None
+
+    def schedule(self):
+        """Mark the workbook as stale; returns immediately."""
+        with self._lock:
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'excel-export-{os.path.basename(self.path)}', daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+        self._wake.set()
+
+    def flush(self):
+        """Export synchronously if changes are pending."""
+        with self._lock:
+            pending = self._first_change is not None
+            self._first_change = None
+            self._last_change = None
+            self._wake.clear()
+        if pending:
+            self._export_or_retry()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            due = False
+            while not due:
+                with self._lock:
+                    if self._first_change is None:
+                        # Already written by flush()
+                        self._wake.clear()
+                        break
+                    now = time.monotonic()
+                    wait = min(self._last_change + self.delay, self._first_change + self.max_delay) - now
+                    if wait <= 0:
+                        self._first_change = None
+                        self._last_change = None
+                        self._wake.clear()
+                        due = True
+                if not due:
+                    time.sleep(wait)
+            if due:
+                self._export_or_retry()
+
+    def _export_or_retry(self):
+        try:
+            self.export()
+        except Exception as e:
+            # For example the workbook is open in Excel on Windows, try again later
+            logger.error(f'Failed to export {self.path}: {e}')
+            with self._lock:
+                now = time.monotonic()
+                if self._first_change is None:
+                    self._first_change = now
+                self._last_change = now
+            self._wake.set()
+
+    def export(self):
+        """Write the workbook now, atomically replacing the previous file."""
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(self.headers)
+        count = 0
+        for row in self.fetch_rows():
+            sheet.append(row)
+            count += 1
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+        os.close(fd)
+        try:
+            workbook.save(tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f'Exported {count} rows to {self.path}')
+        return count
+
+
+def stream_workbook(headers, rows, chunk_size=64 * 1024):
+    """Yield an .xlsx file holding ``headers`` and ``rows`` in byte chunks.
+
+    Rows are written in openpyxl's write-only mode, which spools them to
+    disk, so memory stays flat however many rows there are. The zip file is
+    built in a temporary file and streamed from there, so the first bytes
+    are only sent once every row has been written. Strings are always
+    stored as text, never as formulas.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        cells = []
+        for value in row:
+            if isinstance(value, str):
+                if ILLEGAL_CHARACTERS_RE.search(value):
+                    value = ILLEGAL_CHARACTERS_RE.sub('', value)
+                if value.startswith('='):
+                    # openpyxl would store this as a formula
+                    value = WriteOnlyCell(sheet, value=value)
+                    value.data_type = 's'
+            cells.append(value)
+        sheet.append(cells)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,163 @@
+"""Fill a database with synthetic billers and status history for benchmarks.
+
+The output only depends on the arguments and ``--seed``, so two runs with
+the same arguments produce the same rows and benchmark results stay
+comparable across commits.
+
+* ``--billers``: number of billers. The first ``--top-50`` of them are
+  Top 50 billers, the rest are spread over ISP, MFI, Other and
+  ``--extra-categories`` generated categories with Zipf weights
+  (``--skew``; 0 is uniform, larger values pile billers into the first
+  categories).
+* ``--changes``: mean number of status changes per biller, spread over the
+  ``--history-days`` days before ``--end`` (a fixed date rather than
+  today, so the data does not drift between runs). Each biller's current
+  status is where its history ends.
+
+By default it writes to instance/benchmark.db and never touches the
+application database. Pass ``--database`` to target another URL. Existing
+billers and history in the target are replaced.
+
+Usage: python generate_data.py [--billers 50000] [--changes 3] [--history-days 730]
+                               [--skew 1.1] [--database sqlite:///...]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+BENCHMARK_DB = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'benchmark.db'))
+BASE_CATEGORIES = ('ISP', 'MFI', 'Other')
+# Next status for a biller in each status; mostly forward, sometimes back
+TRANSITIONS = {
+    'not_started': (('in_progress', 'go_live'), (0.85, 0.15)),
+    'in_progress': (('go_live', 'not_started'), (0.8, 0.2)),
+    'go_live': (('in_progress', 'not_started'), (0.7, 0.3)),
+}
+NAME_WORDS = (
+    'Myanmar', 'Golden', 'Royal', 'Shwe', 'City', 'Express', 'Travel', 'Mart', 'Hospital',
+    'Education', 'Finance', 'Mobile', 'Net', 'Link', 'Star', 'Mandalar', 'Yangon', 'Asia',
+    'Pearl', 'Lotus', 'Tech', 'Group', 'Services', 'Trading', 'Microfinance', 'Fiber',
+)
+NOTE_WORDS = ('follow', 'up', 'contract', 'signed', 'pending', 'api', 'keys', 'sent', 'testing',
+              'uat', 'meeting', 'scheduled', 'with', 'finance', 'team', 'waiting', 'for', 'documents')
+INSERT_CHUNK = 5000
+DEFAULT_END = datetime(2025, 1, 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic billers and status history.')
+    parser.add_argument('--billers', type=int, default=50000, help='number of billers (default: %(default)s)')
+    parser.add_argument('--top-50', type=int, default=50, help='Top 50 billers (default: %(default)s)')
+    parser.add_argument('--extra-categories', type=int, default=5,
+                        help='generated categories besides ISP, MFI and Other (default: %(default)s)')
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Zipf exponent of the category sizes (default: %(default)s)')
+    parser.add_argument('--changes', type=float, default=3.0,
+                        help='mean status changes per biller (default: %(default)s)')
+    parser.add_argument('--history-days', type=int, default=730,
+                        help='days of history to spread changes over (default: %(default)s)')
+    parser.add_argument('--end', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        default=DEFAULT_END, help='last day of history, YYYY-MM-DD (default: 2025-01-01)')
+    parser.add_argument('--notes-words', type=int, default=30,
+                        help='mean words in a biller note, 0 for none (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed (default: %(default)s)')
+    parser.add_argument('--database', default=f'sqlite:///{BENCHMARK_DB}',
+                        help='SQLAlchemy URL to fill (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def build_rows(args, end):
+    """Return (biller rows, history rows), history keyed by biller position."""
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed)
+    categories = list(BASE_CATEGORIES) + [f'Category {i + 1:02d}' for i in range(args.extra_categories)]
+    weights = 1.0 / np.arange(1, len(categories) + 1) ** args.skew
+    top_50 = min(args.top_50, args.billers)
+    assigned = rng.choice(len(categories), size=args.billers - top_50, p=weights / weights.sum())
+    change_counts = rng.poisson(args.changes, size=args.billers)
+    first_words = rng.integers(len(NAME_WORDS), size=args.billers)
+    second_words = rng.integers(len(NAME_WORDS), size=args.billers)
+    start = end - timedelta(days=args.history_days)
+    span = args.history_days * 86400
+
+    billers = []
+    history = []
+    for i in range(args.billers):
+        category = 'Top 50' if i < top_50 else categories[assigned[i - top_50]]
+        name = f'{NAME_WORDS[first_words[i]]} {NAME_WORDS[second_words[i]]} {i:06d}'
+        status = 'not_started'
+        onboard_date = start + timedelta(seconds=float(rng.uniform(0, span)))
+        offsets = np.sort(rng.uniform(0, span, size=change_counts[i]))
+        for offset in offsets:
+            targets, probabilities = TRANSITIONS[status]
+            new_status = targets[rng.choice(len(targets), p=probabilities)]
+            changed_at = start + timedelta(seconds=float(offset))
+            history.append((i, name, category, status, new_status, changed_at))
+            if new_status == 'go_live':
+                onboard_date = changed_at
+            status = new_status
+        notes = None
+        if args.notes_words:
+            words = rng.integers(len(NOTE_WORDS), size=max(1, rng.poisson(args.notes_words)))
+            notes = ' '.join(NOTE_WORDS[w] for w in words)
+        billers.append({
+            'name': name,
+            'category': category,
+            'status': status,
+            'is_top_50': i < top_50,
+            'onboard_date': onboard_date,
+            'notes': notes,
+            'web': f'https://biller{i:06d}.example.com' if i % 3 else None,
+        })
+    return billers, history
+
+
+def generate(args):
+    from app import create_app, create_schema
+    from models import (db, Biller, ImportFile, ImportFingerprint, StatusHistory, StatusHistoryDaily,
+                        StatusCube, bump_data_version, rebuild_status_counters)
+    import read_cache
+    from heatmap import rebuild_status_cube
+
+    billers, history = build_rows(args, args.end)
+    with create_app().app_context():
+        create_schema()
+        db.session.execute(db.delete(StatusHistory))
+        db.session.execute(db.delete(StatusHistoryDaily))
+        db.session.execute(db.delete(StatusCube))
+        db.session.execute(db.delete(Biller))
+        # Replaced billers must not look already imported to importer.py
+        db.session.execute(db.delete(ImportFingerprint))
+        db.session.execute(db.delete(ImportFile))
+        for offset in range(0, len(billers), INSERT_CHUNK):
+            db.session.execute(Biller.__table__.insert(), billers[offset:offset + INSERT_CHUNK])
+        ids = dict(db.session.execute(db.select(Biller.name, Biller.id)).all())
+        history_rows = [
+            {'biller_id': ids[name], 'biller_name': name, 'category': category,
+             'old_status': old_status, 'new_status': new_status, 'changed_at': changed_at}
+            for _, name, category, old_status, new_status, changed_at in history
+        ]
+        for offset in range(0, len(history_rows), INSERT_CHUNK):
+            db.session.execute(StatusHistory.__table__.insert(), history_rows[offset:offset + INSERT_CHUNK])
+        rebuild_status_counters()
+        rebuild_status_cube(db.session.connection())
+        bump_data_version()
+        db.session.commit()
+        read_cache.current().clear()
+    return len(billers), len(history_rows)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The app reads its database from the environment when it is created
+    os.environ['DATABASE_URL'] = args.database
+    started = datetime.utcnow()
+    billers, changes = generate(args)
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    print(f'Wrote {billers} billers and {changes} status changes to {args.database} in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
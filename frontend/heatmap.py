@@ -0,0 +1,94 @@
+"""Category x status x month aggregate cube behind /api/heatmap.
+
+``status_cube`` holds one row per (category, status, period) counting the
+status changes into that status during the month. The app adds to it in
+the same transaction as each status change. ``rebuild_status_cube``
+recomputes it from status_history and the daily roll-ups. Reads turn the
+few cube rows into a dense NumPy array, so the payload is three label
+lists plus nested count arrays rather than one dict per cell.
+"""
+from sqlalchemy import text
+
+from dialect import month_sql
+
+STATUSES = ('not_started', 'in_progress', 'go_live')
+
+
+def period_of(moment):
+    return moment.strftime('%Y-%m')
+
+
+def rebuild_status_cube(conn):
+    """Recompute status_cube from history in the caller's transaction."""
+    conn.execute(text('DELETE FROM status_cube'))
+    history_month = month_sql(conn, 'changed_at')
+    daily_month = month_sql(conn, 'day')
+    conn.execute(text(
+        'INSERT INTO status_cube (category, status, period, count) '
+        'SELECT category, new_status, period, SUM(n) FROM ('
+        f'  SELECT category, new_status, {history_month} AS period, COUNT(*) AS n '
+        f'  FROM status_history GROUP BY category, new_status, {history_month} '
+        '  UNION ALL '
+        f'  SELECT category, new_status, {daily_month} AS period, SUM(count) AS n '
+        f'  FROM status_history_daily GROUP BY category, new_status, {daily_month}'
+        ') AS changes GROUP BY category, new_status, period'
+    ))
+
+
+def cube_matrix(conn, since=None, until=None):
+    """Return the cube for periods in [since, until] ('YYYY-MM') as dense arrays.
+
+    ``counts[c][s][p]`` is the number of changes into ``statuses[s]`` for
+    ``categories[c]`` during ``periods[p]``. Periods with no changes inside
+    the covered range are filled with zeros.
+    """
+    import numpy as np
+
+    clauses = []
+    params = {}
+    if since:
+        clauses.append('period >= :since')
+        params['since'] = since
+    if until:
+        clauses.append('period <= :until')
+        params['until'] = until
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = conn.execute(text(
+        f'SELECT category, status, period, count FROM status_cube {where}'
+    ), params).all()
+
+    categories = sorted({row[0] for row in rows})
+    statuses = list(STATUSES) + sorted({row[1] for row in rows} - set(STATUSES))
+    periods = _month_range(min(row[2] for row in rows), max(row[2] for row in rows)) if rows else []
+
+    category_index = {name: i for i, name in enumerate(categories)}
+    status_index = {name: i for i, name in enumerate(statuses)}
+    period_index = {name: i for i, name in enumerate(periods)}
+    counts = np.zeros((len(categories), len(statuses), len(periods)), dtype=np.int64)
+    if rows:
+        c_idx = np.fromiter((category_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+        s_idx = np.fromiter((status_index[row[1]] for row in rows), dtype=np.intp, count=len(rows))
+        p_idx = np.fromiter((period_index[row[2]] for row in rows), dtype=np.intp, count=len(rows))
+        values = np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows))
+        np.add.at(counts, (c_idx, s_idx, p_idx), values)
+
+    return {
+        'categories': categories,
+        'statuses': statuses,
+        'periods': periods,
+        'counts': counts.tolist(),
+        'totals_by_category': counts.sum(axis=(1, 2)).tolist(),
+        'totals_by_period': counts.sum(axis=(0, 1)).tolist()
+    }
+
+
+def _month_range(first, last):
+    year, month = (int(part) for part in first.split('-'))
+    end_year, end_month = (int(part) for part in last.split('-'))
+    periods = []
+    while (year, month) <= (end_year, end_month):
+        periods.append(f'{year:04d}-{month:02d}')
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return periods
@@ -0,0 +1,64 @@
+"""Maintenance for the append-only status_history table.
+
+Old rows are rolled up into ``status_history_daily`` (one row per day,
+category and transition with a count) and then deleted. The table stays
+bounded while long-range charts keep their data. Both statements run in
+the caller's transaction.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from dialect import day_sql
+
+DEFAULT_RETENTION_DAYS = 365
+
+
+def compact_status_history(conn, older_than):
+    """Roll rows changed before ``older_than`` into daily summaries.
+
+    Returns the number of detail rows removed.
+    """
+    day = day_sql(conn, 'changed_at')
+    conn.execute(text(
+        'INSERT INTO status_history_daily (day, category, old_status, new_status, count) '
+        f"SELECT {day}, category, COALESCE(old_status, ''), new_status, COUNT(*) "
+        'FROM status_history WHERE changed_at < :cutoff '
+        f"GROUP BY {day}, category, COALESCE(old_status, ''), new_status "
+        'ON CONFLICT (day, category, old_status, new_status) '
+        'DO UPDATE SET count = status_history_daily.count + excluded.count'
+    ), {'cutoff': older_than})
+    result = conn.execute(
+        text('DELETE FROM status_history WHERE changed_at < :cutoff'),
+        {'cutoff': older_than}
+    )
+    return result.rowcount
+
+
+def retention_cutoff(days=DEFAULT_RETENTION_DAYS, now=None):
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def backfill_legacy_history(conn):
+    """Copy isp_status_history and mfi_status_history rows into status_history.
+
+    Legacy ISP rows store Excel labels ('Go Live'); they are converted to API
+    values. Rows whose name no longer matches a biller keep a NULL biller_id.
+    """
+    label_to_status = (
+        "CASE {column} WHEN 'Not Started' THEN 'not_started' "
+        "WHEN 'In Progress' THEN 'in_progress' "
+        "WHEN 'Go Live' THEN 'go_live' ELSE {column} END"
+    )
+    for table, name_column, category in (('isp_status_history', 'isp_name', 'ISP'),
+                                         ('mfi_status_history', 'mfi_name', 'MFI')):
+        conn.execute(text(
+            'INSERT INTO status_history (biller_id, biller_name, category, old_status, new_status, changed_at) '
+            f'SELECT (SELECT MIN(b.id) FROM biller b WHERE b.name = h.{name_column} AND b.category = :category), '
+            f'h.{name_column}, :category, '
+            f"{label_to_status.format(column='h.old_status')}, "
+            f"{label_to_status.format(column='h.new_status')}, "
+            'h.changed_at '
+            f'FROM {table} h ORDER BY h.changed_at, h.id'
+        ), {'category': category})
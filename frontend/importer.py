@@ -0,0 +1,364 @@
+"""Bulk import of biller workbooks into the biller table.
+
+Workbooks are streamed with openpyxl in read-only mode and handed to the
+importer in fixed-size batches, so memory use does not grow with the
+workbook. Each batch is normalized with vectorized pandas string
+operations, matched against the existing (name, category) keys loaded in
+a single query, and written with executemany INSERT/UPDATE statements,
+one transaction per batch. Unchanged rows are not written at all.
+
+Re-imports are incremental. ``import_file`` keeps a hash of every workbook
+(per source name and category) and an unchanged file is skipped without
+being parsed. ``import_fingerprint`` keeps a fingerprint of the row each
+biller was last imported from, keyed by (name, category). Rows whose
+fingerprint has not changed are skipped, so a re-sync neither writes them
+nor reverts statuses changed through the API since the last import.
+
+Status changes made by an import are recorded like those made through
+the API: a ``status_history`` row and a ``status_cube`` increment per
+changed biller, written in the same transaction as its update.
+"""
+from datetime import datetime
+import hashlib
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import bindparam
+
+from models import (db, Biller, ImportFile, ImportFingerprint, StatusHistory, bump_data_version,
+                    rebuild_status_counters, _add_to_status_cube)
+import dialect
+import read_cache
+
+VALID_STATUSES = ('not_started', 'in_progress', 'go_live')
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def normalize_status(series):
+    """Map free-form Excel statuses ('Go Live', 'in progress', ...) to API values."""
+    status = (
+        series.fillna('')
+        .astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(r'[\s_]+', '_', regex=True)
+    )
+    return status.where(status.isin(VALID_STATUSES), 'not_started')
+
+
+def _clean_text(series):
+    text = series.astype('string').str.strip()
+    return text.where(text.notna() & (text != '') & (text.str.lower() != 'nan'), None)
+
+
+def prepare_frame(df, name_col, category, status_col='Status', web_col='Web'):
+    """Return a normalized frame with name, category, status and web columns.
+
+    Rows without a name are dropped. If a name appears more than once the
+    last row wins, as it did with the old row-by-row import. ``web`` is None
+    for every row when the workbook has no web column.
+    """
+    df = df.rename(columns=lambda c: str(c).strip())
+    frame = pd.DataFrame({'name': _clean_text(df[name_col]) if name_col in df else pd.Series(dtype='string')})
+    frame['category'] = category
+    if status_col in df:
+        frame['status'] = normalize_status(df[status_col])
+    else:
+        frame['status'] = 'not_started'
+    frame['web'] = _clean_text(df[web_col]) if web_col in df else None
+    frame = frame[frame['name'].notna()]
+    frame = frame.drop_duplicates(subset=['name', 'category'], keep='last')
+    # Back to plain Python objects (None instead of pd.NA) for the DB driver
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def load_existing_billers(categories):
+    """Map (name, category) to (id, status, web) for the given categories."""
+    biller = Biller.__table__
+    rows = db.session.execute(
+        db.select(biller.c.id, biller.c.name, biller.c.category, biller.c.status, biller.c.web)
+        .where(biller.c.category.in_(categories))
+        .order_by(biller.c.id)
+    )
+    existing = {}
+    for biller_id, name, category, status, web in rows:
+        # Keep the first row for duplicated keys, as filter_by(...).first() did
+        existing.setdefault((name, category), (biller_id, status, web))
+    return existing
+
+
+def load_fingerprints(categories):
+    """Map (name, category) to the fingerprint of its last imported row."""
+    table = ImportFingerprint.__table__
+    rows = db.session.execute(
+        db.select(table.c.name, table.c.category, table.c.fingerprint).where(table.c.category.in_(categories))
+    )
+    return {(name, category): fingerprint for name, category, fingerprint in rows}
+
+
+def row_fingerprint(status, web):
+    """Short stable hash of the imported fields of a prepared row."""
+    return hashlib.blake2b(f'{status}\x1f{web or ""}'.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def file_digest(path, *options):
+    """SHA-256 of the file contents and the import ``options``, as hex."""
+    digest = hashlib.sha256('\x1f'.join(str(option) for option in options).encode('utf-8'))
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_fingerprints(rows, chunk_size):
+    if not rows:
+        return
+    conn = db.session.connection()
+    table = ImportFingerprint.__table__
+    stmt = dialect.insert(conn, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.name, table.c.category], set_={'fingerprint': stmt.excluded.fingerprint}
+    )
+    for chunk in _chunks(rows, chunk_size):
+        conn.execute(stmt, chunk)
+        db.session.commit()
+
+
+def _record_status_changes(changes, changed_at):
+    """Append history rows and cube increments for imported status changes.
+
+    ``changes`` are status_history rows; those of billers inserted earlier
+    in the same import have no ``biller_id`` yet and are resolved by key.
+    Runs in the caller's transaction.
+    """
+    if not changes:
+        return
+    unresolved = {(row['biller_name'], row['category']) for row in changes if row['biller_id'] is None}
+    if unresolved:
+        biller = Biller.__table__
+        ids = dict(
+            ((name, category), biller_id) for name, category, biller_id in db.session.execute(
+                db.select(biller.c.name, biller.c.category, db.func.min(biller.c.id))
+                .where(db.tuple_(biller.c.name, biller.c.category).in_(unresolved))
+                .group_by(biller.c.name, biller.c.category)
+            )
+        )
+        for row in changes:
+            if row['biller_id'] is None:
+                row['biller_id'] = ids.get((row['biller_name'], row['category']))
+    db.session.execute(StatusHistory.__table__.insert(), changes)
+    cube_deltas = {}
+    for row in changes:
+        key = (row['category'], row['new_status'])
+        cube_deltas[key] = cube_deltas.get(key, 0) + 1
+    for (category, status), delta in cube_deltas.items():
+        _add_to_status_cube(category, status, changed_at, delta)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def import_frame(frame, update_web=True, chunk_size=DEFAULT_CHUNK_SIZE, existing=None, fingerprints=None):
+    """Insert new billers and update changed ones from a prepared frame.
+
+    ``existing`` is the map returned by ``load_existing_billers``. Pass the
+    same map for every batch of a workbook; it is updated in place so later
+    batches see earlier ones. With ``fingerprints`` (from
+    ``load_fingerprints``, also updated in place) rows of existing billers
+    whose fingerprint is unchanged are skipped, and new fingerprints are
+    saved. Returns a dict with ``inserted``, ``updated`` and ``unchanged``
+    counts. Must be called inside an application context.
+    """
+    biller = Biller.__table__
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if frame.empty:
+        return counts
+
+    if existing is None:
+        existing = load_existing_billers(list(frame['category'].unique()))
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+    key_updates = []
+    new_fingerprints = []
+    for name, category, status, web in frame[['name', 'category', 'status', 'web']].itertuples(index=False, name=None):
+        current = existing.get((name, category))
+        if fingerprints is not None:
+            fingerprint = row_fingerprint(status, web)
+            if current is not None and fingerprints.get((name, category)) == fingerprint:
+                counts['unchanged'] += 1
+                continue
+            fingerprints[(name, category)] = fingerprint
+            new_fingerprints.append({'name': name, 'category': category, 'fingerprint': fingerprint})
+        if current is None:
+            inserts.append({
+                'name': name,
+                'category': category,
+                'status': status,
+                'is_top_50': category == 'Top 50',
+                'onboard_date': now,
+                'notes': None,
+                'web': web,
+            })
+            # Inserted rows have no id yet, later duplicates update by key
+            existing[(name, category)] = (None, status, web)
+            continue
+        biller_id, current_status, current_web = current
+        if not update_web:
+            web = current_web
+        if status == current_status and web == current_web:
+            counts['unchanged'] += 1
+            continue
+        existing[(name, category)] = (biller_id, status, web)
+        change = None
+        if status != current_status:
+            change = {'biller_id': biller_id, 'biller_name': name, 'category': category,
+                      'old_status': current_status, 'new_status': status, 'changed_at': now}
+        if biller_id is None:
+            key_updates.append(({'b_name': name, 'b_category': category, 'b_status': status, 'b_web': web},
+                                change))
+        else:
+            updates.append(({'b_id': biller_id, 'b_status': status, 'b_web': web}, change))
+
+    update_stmt = (
+        biller.update()
+        .where(biller.c.id == bindparam('b_id'))
+        .values(status=bindparam('b_status'), web=bindparam('b_web'))
+    )
+    key_update_stmt = (
+        biller.update()
+        .where(biller.c.name == bindparam('b_name'), biller.c.category == bindparam('b_category'))
+        .values(status=bindparam('b_status'), web=bindparam('b_web'))
+    )
+    for chunk in _chunks(inserts, chunk_size):
+        db.session.execute(biller.insert(), chunk)
+        db.session.commit()
+        counts['inserted'] += len(chunk)
+    for stmt, rows in ((update_stmt, updates), (key_update_stmt, key_updates)):
+        for chunk in _chunks(rows, chunk_size):
+            db.session.connection().execute(stmt, [params for params, _ in chunk])
+            _record_status_changes([change for _, change in chunk if change], now)
+            db.session.commit()
+            counts['updated'] += len(chunk)
+    # Saved after the billers, so a failed batch is compared again next time
+    _save_fingerprints(new_fingerprints, chunk_size)
+    return counts
+
+
+def read_header(path):
+    """Return the stripped header row of the first sheet."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+    finally:
+        workbook.close()
+    return [str(c).strip() if c is not None else '' for c in header]
+
+
+def iter_workbook_frames(path, name_col, category, status_col='Status', web_col='Web',
+                         chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the first sheet of a workbook as prepared frames of ``chunk_size`` rows.
+
+    Only the name, status and web columns are kept, and only one batch of
+    rows is held in memory at a time.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else '' for c in next(rows, ())]
+        wanted = [col for col in (name_col, status_col, web_col) if col and col in header]
+        positions = [header.index(col) for col in wanted]
+        batch = []
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            if len(batch) >= chunk_size:
+                yield prepare_frame(pd.DataFrame(batch, columns=wanted), name_col, category, status_col, web_col)
+                batch = []
+        if batch:
+            yield prepare_frame(pd.DataFrame(batch, columns=wanted), name_col, category, status_col, web_col)
+    finally:
+        workbook.close()
+
+
+def import_workbook(path, name_col, category, status_col='Status', web_col='Web',
+                    chunk_size=DEFAULT_CHUNK_SIZE, progress=None, skip_errors=False, source=None, force=False):
+    """Stream one workbook into the biller table, then refresh the status counters.
+
+    A workbook whose contents and columns are unchanged since it was last
+    imported from ``source`` (default: the file name) into ``category`` is
+    skipped, and ``skipped`` is True in the result. ``force`` re-imports it
+    and ignores the row fingerprints.
+
+    Raises ValueError when the workbook has no ``name_col`` column.
+
+    ``progress(totals)`` is called after every batch. With ``skip_errors`` a
+    batch that fails to write is rolled back and counted in ``errors``
+    (``last_error`` holds the message) instead of aborting the import.
+    """
+    source = source or os.path.basename(path)
+    header = read_header(path)
+    if name_col not in header:
+        raise ValueError(f'Column {name_col!r} not found in {source}')
+    totals = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0, 'last_error': None,
+              'skipped': False}
+    content_hash = file_digest(path, name_col, status_col, web_col)
+    previous = db.session.get(ImportFile, (source, category))
+    if previous is not None and previous.content_hash == content_hash and not force:
+        totals['skipped'] = True
+        return totals
+
+    update_web = bool(web_col) and web_col in header
+    existing = load_existing_billers([category])
+    fingerprints = {} if force else load_fingerprints([category])
+    # Batches commit on their own, so once one may have written rows the
+    # counters, data version and caches are refreshed even if a later
+    # batch or the workbook itself fails
+    changed = False
+    completed = False
+    try:
+        for frame in iter_workbook_frames(path, name_col, category, status_col, web_col, chunk_size):
+            try:
+                counts = import_frame(frame, update_web=update_web, chunk_size=chunk_size, existing=existing,
+                                      fingerprints=fingerprints)
+            except Exception as e:
+                # Earlier chunks of the batch may have been committed
+                changed = True
+                if not skip_errors:
+                    raise
+                db.session.rollback()
+                # Rows of the failed batch may or may not have been written
+                existing = load_existing_billers([category])
+                fingerprints = {} if force else load_fingerprints([category])
+                counts = {'errors': len(frame)}
+                totals['last_error'] = str(e)
+            if counts.get('inserted') or counts.get('updated'):
+                changed = True
+            for key, value in counts.items():
+                totals[key] += value
+            totals['rows'] += len(frame)
+            if progress is not None:
+                progress(totals)
+        completed = True
+    finally:
+        if not completed:
+            db.session.rollback()
+        if changed:
+            rebuild_status_counters()
+            bump_data_version()
+        if completed and not totals['errors']:
+            # Only a complete import lets the next run skip this file
+            dialect.upsert(
+                db.session.connection(), ImportFile.__table__,
+                {'source': source, 'category': category, 'content_hash': content_hash,
+                 'rows': totals['rows'], 'imported_at': datetime.utcnow()},
+                ('source', 'category'),
+                lambda columns, excluded: {'content_hash': excluded.content_hash, 'rows': excluded.rows,
+                                           'imported_at': excluded.imported_at}
+            )
+        db.session.commit()
+        if changed:
+            read_cache.current().clear()
+    return totals
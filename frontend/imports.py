@@ -0,0 +1,136 @@
+"""Background imports of uploaded biller workbooks.
+
+``POST /api/imports`` stores the upload and records an ``ImportJob`` row,
+then ``ImportQueue.submit`` hands the job to a small thread pool so the
+request returns straight away. The worker streams the workbook through
+importer.import_workbook and writes its progress to the job row after
+every batch, so ``GET /api/imports/<id>`` can be answered by any server
+process.
+
+Imports are throttled rather than run side by side: ``IMPORT_WORKERS``
+(default 1) jobs write at a time, which keeps them from fighting over the
+SQLite write lock, and at most ``IMPORT_QUEUE_MAX`` jobs (default 4) may
+be waiting or running per process. ``reserve`` returns False beyond that
+and the API answers 429.
+
+A job ends ``done``, ``failed``, or ``skipped`` when the same workbook was
+already imported into that category (see importer.py).
+
+The uploaded file is deleted once its job finishes, whatever the outcome.
+Jobs live in the process that accepted them. A job still queued or
+running when its process exits stays in that state, and its upload is
+left in ``UPLOAD_DIR``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import os
+import threading
+
+from flask import current_app
+
+from models import db, ImportJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+DEFAULT_QUEUE_MAX = 4
+ALLOWED_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+class ImportQueue:
+    def __init__(self, app, workers=DEFAULT_WORKERS, max_pending=DEFAULT_QUEUE_MAX):
+        self.app = app
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+
+    @classmethod
+    def from_env(cls, app):
+        return cls(
+            app,
+            workers=int(os.environ.get('IMPORT_WORKERS', DEFAULT_WORKERS)),
+            max_pending=int(os.environ.get('IMPORT_QUEUE_MAX', DEFAULT_QUEUE_MAX))
+        )
+
+    def reserve(self):
+        """Claim a queue slot; False if ``max_pending`` jobs are already waiting or running."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def release(self):
+        """Give back a slot claimed by ``reserve`` that was not submitted."""
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, job_id):
+        """Run job ``job_id`` in the background; needs a slot from ``reserve``."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='import')
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                run_import(job_id)
+        except Exception:
+            logger.exception(f'Import job {job_id} failed')
+        finally:
+            self.release()
+
+
+def run_import(job_id):
+    """Import the workbook of job ``job_id``, recording progress on the job row."""
+    # pandas and openpyxl are only loaded once the first import runs
+    from importer import import_workbook
+
+    job = db.session.get(ImportJob, job_id)
+    job.state = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    def record_progress(totals):
+        job.rows_processed = totals['rows']
+        job.inserted = totals['inserted']
+        job.updated = totals['updated']
+        job.unchanged = totals['unchanged']
+        job.errors = totals['errors']
+        job.error_message = totals['last_error']
+        db.session.commit()
+
+    try:
+        totals = import_workbook(job.path, job.name_col, job.category, job.status_col, job.web_col,
+                                 progress=record_progress, skip_errors=True, source=job.filename)
+    except Exception as e:
+        db.session.rollback()
+        job.state = 'failed'
+        job.error_message = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    finally:
+        # The upload is only needed while the job runs
+        remove_upload(job.path)
+    job.state = 'skipped' if totals['skipped'] else 'done'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    if job.category == 'ISP' and (totals['inserted'] or totals['updated']):
+        current_app.extensions['isp_workbook_exporter'].schedule()
+    logger.info(f'Import job {job_id} ({job.filename}): {totals["inserted"]} inserted, '
+                f'{totals["updated"]} updated, {totals["unchanged"]} unchanged, {totals["errors"]} errors')
+    return totals
+
+
+def remove_upload(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f'Could not remove upload {path}: {e}')
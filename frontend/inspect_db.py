@@ -1,19 +1,15 @@
-import sqlite3
+from app import create_app
+from models import db, Biller
 
-conn = sqlite3.connect(r'../instance/biller_tracker.db')
-cursor = conn.cursor()
+with create_app().app_context():
+    print(f"Database: {db.engine.url.render_as_string(hide_password=True)}")
 
-print("Tables:")
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-print(cursor.fetchall())
+    print("Tables:")
+    print(db.inspect(db.engine).get_table_names())
 
-print("\nBiller count:")
-cursor.execute("SELECT COUNT(*) FROM Biller;")
-print(cursor.fetchone())
+    print("\nBiller count:")
+    print(db.session.query(db.func.count(Biller.id)).scalar())
 
-print("\nSample rows from Biller:")
-cursor.execute("SELECT * FROM Biller LIMIT 10;")
-for row in cursor.fetchall():
-    print(row)
-
-conn.close()
+    print("\nSample rows from Biller:")
+    for row in db.session.execute(db.select(Biller.__table__).order_by(Biller.id).limit(10)):
+        print(tuple(row))
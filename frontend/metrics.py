@@ -0,0 +1,253 @@
+"""Opt-in request instrumentation exposed in Prometheus text format.
+
+``install(app)`` records, per route template:
+
+* request latency as a histogram,
+* request count by status code,
+* response bytes,
+* SQL statements and time spent in them, via SQLAlchemy cursor events.
+
+The numbers are served on ``/metrics``. They are recorded when the server
+closes the response, so a streamed body (``stream_with_context``) is
+measured in full: the rows it fetches and the bytes it yields count
+towards its route. Each response also carries a ``Server-Timing`` header,
+which has to be sent before the body and so only covers the work done
+until the headers were ready.
+
+Optionally a sample of requests runs under cProfile and the profile is
+written to ``profile_dir`` when the request was slower than
+``profile_slow_ms``. Open dumps with ``python -m pstats <file>`` or snakeviz.
+
+Counters live in the process, so with several gunicorn workers each one
+reports its own series.
+"""
+import cProfile
+from datetime import datetime
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}         # (method, route) -> Histogram
+        self.requests = {}        # (method, route, status) -> count
+        self.response_bytes = {}  # (method, route) -> bytes
+        self.queries = {}         # (method, route) -> statements
+        self.query_seconds = {}   # (method, route) -> seconds
+
+    def record(self, method, route, status, seconds, size, queries, query_seconds):
+        key = (method, route)
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(seconds)
+            status_key = (method, route, status)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            if size:
+                self.response_bytes[key] = self.response_bytes.get(key, 0) + size
+            self.queries[key] = self.queries.get(key, 0) + queries
+            self.query_seconds[key] = self.query_seconds.get(key, 0.0) + query_seconds
+
+    def render(self):
+        """Return every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_request_duration_seconds Time to produce a response, per route.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (method, route), histogram in sorted(self.latency.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.total:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+            lines += [
+                '# HELP http_requests_total Requests handled, per route and status code.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}'
+                )
+            for name, help_text, series, fmt in (
+                ('http_response_bytes_total', 'Response body bytes sent, streamed bodies included.',
+                 self.response_bytes, '{}'),
+                ('db_queries_total', 'SQL statements executed while handling requests.',
+                 self.queries, '{}'),
+                ('db_query_seconds_total', 'Time spent executing SQL while handling requests.',
+                 self.query_seconds, '{:.6f}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (method, route), value in sorted(series.items()):
+                    lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {fmt.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class RequestStats:
+    """Measurements of one request, kept until its response is closed."""
+    __slots__ = ('start', 'queries', 'query_seconds', 'size', 'profiler')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.size = 0
+        self.profiler = None
+
+
+def _count_bytes(body, stats, response_charset='utf-8'):
+    try:
+        for chunk in body:
+            stats.size += len(chunk.encode(response_charset) if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        # Pass a client disconnect on, event streams unsubscribe on close
+        close = getattr(body, 'close', None)
+        if close is not None:
+            close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics' in g:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts or not has_request_context() or 'metrics' not in g:
+        return
+    g.metrics.queries += 1
+    g.metrics.query_seconds += time.perf_counter() - starts.pop()
+
+
+def _handle_error(context):
+    # The statement failed, drop its start time so later queries pair up
+    starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def install_from_env(app, default_profile_dir):
+    """Call ``install`` if METRICS_ENABLED=1.
+
+    PROFILE_SAMPLE_RATE (0-1, default 0), PROFILE_SLOW_MS (default 500) and
+    PROFILE_DIR configure the sampling profiler. Returns the Registry or None.
+    """
+    if os.environ.get('METRICS_ENABLED', '0') != '1':
+        return None
+    return install(
+        app,
+        profile_sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        profile_slow_ms=float(os.environ.get('PROFILE_SLOW_MS', 500)),
+        profile_dir=os.environ.get('PROFILE_DIR', default_profile_dir)
+    )
+
+
+def install(app, profile_sample_rate=0.0, profile_slow_ms=500, profile_dir=None):
+    """Instrument ``app`` and add the ``/metrics`` route. Returns the Registry.
+
+    Install before other request hooks so their queries are counted too.
+    """
+    registry = Registry()
+    if profile_sample_rate and profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    # Engine-wide listeners, registered once however many apps are created
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute),
+                           ('handle_error', _handle_error)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics = RequestStats()
+        if profile_sample_rate and profile_dir and random.random() < profile_sample_rate:
+            g.metrics.profiler = cProfile.Profile()
+            g.metrics.profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = g.get('metrics')
+        if stats is None:
+            return response
+        method = request.method
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        status = response.status_code
+        if response.is_streamed:
+            response.response = _count_bytes(response.response, stats)
+        else:
+            stats.size = response.calculate_content_length()
+        response.headers['Server-Timing'] = (
+            f'app;dur={(time.perf_counter() - stats.start) * 1000:.1f}, '
+            f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries"'
+        )
+
+        @response.call_on_close
+        def record():
+            # Runs once the server has sent the whole body
+            elapsed = time.perf_counter() - stats.start
+            if stats.profiler is not None:
+                stats.profiler.disable()
+                if elapsed * 1000 >= profile_slow_ms:
+                    _dump_profile(stats.profiler, profile_dir, method, route, elapsed)
+            registry.record(method, route, status, elapsed, stats.size, stats.queries, stats.query_seconds)
+
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
+
+
+def _dump_profile(profiler, profile_dir, method, route, elapsed):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    path = os.path.join(profile_dir, f'{stamp}-{method}-{slug}-{int(elapsed * 1000)}ms.prof')
+    try:
+        profiler.dump_stats(path)
+    except OSError as e:
+        logger.warning(f'Could not write profile {path}: {e}')
+        return
+    logger.info(f'Slow request {method} {route} took {elapsed * 1000:.0f} ms, profile written to {path}')
@@ -1,11 +1,11 @@
-import pandas as pd
-from datetime import datetime
-from app import db, app, Biller
+from app import create_app, create_schema
+from importer import DEFAULT_CHUNK_SIZE, import_workbook
+import argparse
 import os
 
 # Map Excel files to their categories/types
 excel_files = [
-    {'file': 'fifty.xlsx', 'category': 'Top 50', 'name_col': 'Biller', 'status_col': 'Status'},
+    {'file': 'fifty.xlsx', 'category': 'Top 50', 'name_col': 'Biller Name', 'status_col': 'Status'},
     {'file': 'noti.xlsx', 'category': 'ISP', 'name_col': 'ISP', 'status_col': 'Status'},
     {'file': 'mfi.xlsx', 'category': 'MFI', 'name_col': 'MFI', 'status_col': 'Status'},
     # Add more as needed
@@ -13,50 +13,28 @@ excel_files = [
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def migrate():
-    with app.app_context():
+def migrate(chunk_size=DEFAULT_CHUNK_SIZE, force=False):
+    with create_app().app_context():
+        create_schema()
         for excel in excel_files:
             path = os.path.join(BASE_DIR, excel['file'])
             if not os.path.exists(path):
                 print(f"File not found: {path}")
                 continue
-            df = pd.read_excel(path)
-            name_col = excel['name_col']
-            status_col = excel['status_col']
-            category = excel['category']
-            for _, row in df.iterrows():
-                name = str(row.get(name_col, '')).strip()
-                if not name:
-                    continue
-                status = str(row.get(status_col, 'not_started')).strip().lower().replace(' ', '_')
-                # Map status to allowed values
-                if status in ['go_live', 'go live']:
-                    status = 'go_live'
-                elif status in ['in_progress', 'in progress']:
-                    status = 'in_progress'
-                elif status in ['not_started', 'not started']:
-                    status = 'not_started'
-                else:
-                    status = 'not_started'
-                # Check if biller exists
-                biller = Biller.query.filter_by(name=name, category=category).first()
-                web = str(row.get('Web', '')).strip() if 'Web' in row else None
-                if biller:
-                    biller.status = status
-                    biller.web = web
-                else:
-                    biller = Biller(
-                        name=name,
-                        category=category,
-                        status=status,
-                        is_top_50=(category == 'Top 50'),
-                        onboard_date=datetime.utcnow(),
-                        notes=None,
-                        web=web
-                    )
-                    db.session.add(biller)
-            db.session.commit()
+            counts = import_workbook(path, excel['name_col'], excel['category'], excel['status_col'],
+                                     chunk_size=chunk_size, force=force)
+            if counts['skipped']:
+                print(f"{excel['file']}: unchanged since the last import, skipped")
+                continue
+            print(f"{excel['file']}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                  f"{counts['unchanged']} unchanged")
         print("Migration complete. Website URLs included if present.")
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description='Import the biller workbooks into the database.')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='rows read and written per batch (default: %(default)s)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-import workbooks and rows that have not changed since the last run')
+    args = parser.parse_args()
+    migrate(chunk_size=args.chunk_size, force=args.force)
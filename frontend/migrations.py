@@ -0,0 +1,150 @@
+"""Versioned schema migrations for the biller tracker database.
+
+``db.create_all()`` only creates missing tables, so column additions and
+indexes on existing databases are applied here. Every migration has a
+version number, runs once and is recorded in the ``schema_version`` table.
+Migrations must be idempotent because an older database may already
+contain changes that were made by the old one-off scripts.
+
+Add new migrations to the end of ``MIGRATIONS`` with the next version.
+"""
+from datetime import datetime
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from heatmap import rebuild_status_cube
+from history import backfill_legacy_history
+from search import create_fts_index, drop_fts_index, fts_available
+
+logger = logging.getLogger(__name__)
+
+
+def _add_web_column(conn):
+    columns = [column['name'] for column in inspect(conn).get_columns('biller')]
+    if 'web' not in columns:
+        conn.execute(text('ALTER TABLE biller ADD COLUMN web VARCHAR(255)'))
+
+
+def _add_lookup_indexes(conn):
+    statements = [
+        'CREATE INDEX IF NOT EXISTS ix_biller_category_status ON biller (category, status)',
+        'CREATE INDEX IF NOT EXISTS ix_biller_top_50_status ON biller (is_top_50, status)',
+        'CREATE INDEX IF NOT EXISTS ix_biller_name_category ON biller (name, category)',
+        'CREATE INDEX IF NOT EXISTS ix_isp_status_history_name_changed '
+        'ON isp_status_history (isp_name, changed_at DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_mfi_status_history_name_changed '
+        'ON mfi_status_history (mfi_name, changed_at DESC)',
+    ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _add_name_order_index(conn):
+    # (name, id) is the keyset order used by /api/billers pagination
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_biller_name_id ON biller (name, id)'))
+
+
+def _add_biller_fts(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    try:
+        with conn.begin_nested():
+            create_fts_index(conn)
+    except OperationalError as e:
+        # SQLite built without FTS5, name search falls back to LIKE
+        logger.warning(f'Full-text search index not created: {e}')
+
+
+def _rebuild_biller_fts(conn):
+    # Recreate the index built before Myanmar marks were token characters
+    if not fts_available(conn):
+        return
+    drop_fts_index(conn)
+    create_fts_index(conn)
+
+
+def _seed_data_version(conn):
+    # data_version itself is created by db.create_all()
+    conn.execute(text(
+        'INSERT INTO data_version (id, version, updated_at) '
+        'SELECT 1, 1, :now WHERE NOT EXISTS (SELECT 1 FROM data_version WHERE id = 1)'
+    ), {'now': datetime.utcnow()})
+
+
+def _unify_status_history(conn):
+    # status_history itself is created by db.create_all()
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_status_history_biller_changed '
+        'ON status_history (biller_id, changed_at)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_status_history_changed ON status_history (changed_at)'
+    ))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_status_history_category_changed '
+        'ON status_history (category, changed_at)'
+    ))
+    if conn.execute(text('SELECT 1 FROM status_history LIMIT 1')).first() is None:
+        backfill_legacy_history(conn)
+
+
+def _seed_status_cube(conn):
+    # status_cube itself is created by db.create_all()
+    rebuild_status_cube(conn)
+
+
+MIGRATIONS = [
+    (1, 'Add biller.web column', _add_web_column),
+    (2, 'Add biller and status history lookup indexes', _add_lookup_indexes),
+    (3, 'Add biller (name, id) keyset index', _add_name_order_index),
+    (4, 'Add biller full-text search index', _add_biller_fts),
+    (5, 'Seed the global data version row', _seed_data_version),
+    (6, 'Add unified status_history indexes and copy legacy history', _unify_status_history),
+    (7, 'Build the heatmap status cube from history', _seed_status_cube),
+    (8, 'Rebuild the biller full-text index with Myanmar marks as word characters', _rebuild_biller_fts),
+]
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_version ('
+            'version INTEGER PRIMARY KEY, '
+            'description VARCHAR(255) NOT NULL, '
+            'applied_at TIMESTAMP NOT NULL)'
+        ))
+
+
+def applied_versions(engine):
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_version'))}
+
+
+def run_migrations(engine):
+    """Apply every pending migration, each in its own transaction.
+
+    Returns the list of versions applied by this call. Safe to call on every
+    startup and from several processes at once.
+    """
+    applied = applied_versions(engine)
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(
+                    text('INSERT INTO schema_version (version, description, applied_at) '
+                         'VALUES (:version, :description, :applied_at)'),
+                    {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+                )
+        except IntegrityError:
+            # Another process recorded this version first
+            continue
+        logger.info(f'Applied migration {version}: {description}')
+        newly_applied.append(version)
+    return newly_applied
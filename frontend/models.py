@@ -0,0 +1,351 @@
+"""Database models and the counter, history and data version helpers.
+
+Importing this module has no side effects: ``db`` is bound to an
+application by ``create_app()`` in app.py, and tables are created by
+``create_schema.py`` (or ``app.create_schema``), never on import. Scripts
+that only need the data layer import from here.
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+import dialect
+import heatmap
+
+db = SQLAlchemy()
+
+# ISP Status History Model (legacy, superseded by StatusHistory)
+class ISPStatusHistory(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    isp_name = db.Column(db.String(100), nullable=False)
+    old_status = db.Column(db.String(20))
+    new_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'isp_name': self.isp_name,
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+# Biller Model
+class Biller(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    is_top_50 = db.Column(db.Boolean, default=False)
+    onboard_date = db.Column(db.DateTime, default=datetime.utcnow)
+    notes = db.Column(db.Text)
+    web = db.Column(db.String(255))  # New column for website
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'status': self.status,
+            'is_top_50': self.is_top_50,
+            'onboard_date': self.onboard_date.isoformat() if self.onboard_date else None,
+            'notes': self.notes,
+            'web': self.web
+        }
+
+STATUSES = ('not_started', 'in_progress', 'go_live')
+
+# Materialized status counters, kept in step with every Biller status change
+class StatusCounter(db.Model):
+    __tablename__ = 'status_counters'
+    category = db.Column(db.String(50), primary_key=True)
+    is_top_50 = db.Column(db.Boolean, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime)
+
+def _grouped_status_buckets():
+    """Status counter buckets computed from the biller table in one GROUP BY."""
+    rows = db.session.query(
+        Biller.category,
+        Biller.is_top_50,
+        Biller.status,
+        db.func.count(Biller.id),
+        db.func.max(Biller.onboard_date)
+    ).group_by(Biller.category, Biller.is_top_50, Biller.status).all()
+    buckets = {}
+    for category, is_top_50, status, count, max_onboard in rows:
+        key = (category, bool(is_top_50), status)
+        prev_count, prev_last = buckets.get(key, (0, None))
+        if prev_last and (max_onboard is None or prev_last > max_onboard):
+            max_onboard = prev_last
+        buckets[key] = (prev_count + count, max_onboard)
+    return buckets
+
+def rebuild_status_counters():
+    """Recompute status_counters from the biller table in one GROUP BY.
+
+    Used after bulk imports and maintenance scripts that bypass the status
+    endpoints, and by create_schema(). The caller is responsible for committing.
+    """
+    buckets = _grouped_status_buckets()
+    db.session.query(StatusCounter).delete()
+    db.session.add_all([
+        StatusCounter(category=category, is_top_50=is_top_50, status=status,
+                      count=count, last_updated=last_updated)
+        for (category, is_top_50, status), (count, last_updated) in buckets.items()
+    ])
+
+def _adjust_status_counter(category, is_top_50, status, delta, onboard_date=None):
+    def update(counter, proposed):
+        values = {'count': counter.count + proposed.count}
+        if onboard_date:
+            values['last_updated'] = db.case(
+                (db.or_(counter.last_updated.is_(None), counter.last_updated < proposed.last_updated),
+                 proposed.last_updated),
+                else_=counter.last_updated
+            )
+        return values
+
+    dialect.upsert(
+        db.session.connection(), StatusCounter.__table__,
+        {'category': category, 'is_top_50': bool(is_top_50), 'status': status,
+         'count': delta, 'last_updated': onboard_date},
+        ('category', 'is_top_50', 'status'), update
+    )
+
+# Append-only history of every biller status change
+class StatusHistory(db.Model):
+    __tablename__ = 'status_history'
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key, history outlives billers removed by dedup
+    biller_id = db.Column(db.Integer)
+    biller_name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    old_status = db.Column(db.String(20))
+    new_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'biller_id': self.biller_id,
+            'biller_name': self.biller_name,
+            'category': self.category,
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+# Daily roll-up of status_history rows removed by retention
+class StatusHistoryDaily(db.Model):
+    __tablename__ = 'status_history_daily'
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    old_status = db.Column(db.String(20), primary_key=True)
+    new_status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# Category x status x month cube of status changes, see heatmap.py
+class StatusCube(db.Model):
+    __tablename__ = 'status_cube'
+    category = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    period = db.Column(db.String(7), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def _add_to_status_cube(category, status, changed_at, delta=1):
+    dialect.upsert(
+        db.session.connection(), StatusCube.__table__,
+        {'category': category, 'status': status, 'period': heatmap.period_of(changed_at), 'count': delta},
+        ('category', 'status', 'period'),
+        lambda cube, proposed: {'count': cube.count + proposed.count}
+    )
+
+def lock_billers(query):
+    """Return ``query`` with the billers it loads locked until commit.
+
+    Load a biller through this before reading the status it is about to
+    leave, so two concurrent changes cannot both move it out of the same
+    counter bucket.
+    """
+    return dialect.lock_for_update(db.session.connection(), query).populate_existing()
+
+def record_status_change(biller, old_status):
+    """Move a biller between counter buckets and append its history row.
+
+    Call after assigning the new status and before committing, so the
+    counters, the history row and the biller row are written together.
+    ``biller`` must have been loaded with ``lock_billers``.
+    Returns the StatusHistory row, or None if the status did not change.
+    """
+    if old_status == biller.status:
+        return None
+    if old_status is not None:
+        _adjust_status_counter(biller.category, biller.is_top_50, old_status, -1)
+    _adjust_status_counter(biller.category, biller.is_top_50, biller.status, 1, biller.onboard_date)
+    history = StatusHistory(
+        biller_id=biller.id,
+        biller_name=biller.name,
+        category=biller.category,
+        old_status=old_status,
+        new_status=biller.status,
+        changed_at=datetime.utcnow()
+    )
+    db.session.add(history)
+    _add_to_status_cube(biller.category, biller.status, history.changed_at)
+    return history
+
+def refresh_status_counter_dates():
+    """Recompute last_updated for every bucket after onboard dates were edited."""
+    table = StatusCounter.__table__
+    biller = Biller.__table__
+    latest = db.select(db.func.max(biller.c.onboard_date)).where(
+        biller.c.category == table.c.category,
+        db.func.coalesce(biller.c.is_top_50, False) == table.c.is_top_50,
+        biller.c.status == table.c.status
+    ).scalar_subquery()
+    db.session.execute(table.update().values(last_updated=latest))
+
+def _status_counter_rows():
+    rows = db.session.query(
+        StatusCounter.category,
+        StatusCounter.is_top_50,
+        StatusCounter.status,
+        StatusCounter.count,
+        StatusCounter.last_updated
+    ).all()
+    if not rows:
+        # Counters not built yet (create_schema() rebuilds them); reads never
+        # write, so count from the biller table instead
+        return [(category, is_top_50, status, count, last_updated)
+                for (category, is_top_50, status), (count, last_updated)
+                in _grouped_status_buckets().items()]
+    return rows
+
+def status_counts(category=None, is_top_50=None, ignore_case=False):
+    result = {status: 0 for status in STATUSES}
+    if category is not None and ignore_case:
+        category = category.lower()
+    for cat, top_50, status, count, _ in _status_counter_rows():
+        if status not in result:
+            continue
+        if category is not None and (cat.lower() if ignore_case else cat) != category:
+            continue
+        if is_top_50 is not None and top_50 != is_top_50:
+            continue
+        result[status] += count
+    return result
+
+def dashboard_overview():
+    total_billers = 0
+    last_updated = None
+    unavailable = {'ISP': 0, 'MFI': 0}
+    for category, _, status, count, bucket_updated in _status_counter_rows():
+        total_billers += count
+        if category in unavailable and status != 'go_live':
+            unavailable[category] += count
+        if count and bucket_updated and (last_updated is None or bucket_updated > last_updated):
+            last_updated = bucket_updated
+    return {
+        'target_count': total_billers,
+        'unavailable_isp': unavailable['ISP'],
+        'unavailable_mfi': unavailable['MFI'],
+        'last_updated': last_updated.isoformat() if last_updated else None
+    }
+
+# Global data version, bumped in the same transaction as every write
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def bump_data_version():
+    """Increment the data version; the caller commits with its other changes."""
+    dialect.upsert(
+        db.session.connection(), DataVersion.__table__,
+        {'id': 1, 'version': 1, 'updated_at': datetime.utcnow()}, ('id',),
+        lambda current, proposed: {'version': current.version + 1, 'updated_at': proposed.updated_at}
+    )
+
+def current_data_version():
+    """Return (version, updated_at) with a single primary key lookup."""
+    table = DataVersion.__table__
+    with db.engine.connect() as conn:
+        row = conn.execute(
+            db.select(table.c.version, table.c.updated_at).where(table.c.id == 1)
+        ).first()
+    return (row[0], row[1]) if row else (0, None)
+
+# MFI Status History Model (legacy, superseded by StatusHistory)
+class MFIStatusHistory(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    mfi_name = db.Column(db.String(100), nullable=False)
+    old_status = db.Column(db.String(20))
+    new_status = db.Column(db.String(20), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mfi_name': self.mfi_name,
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+# Content hash of each workbook as last imported into a category, see importer.py
+class ImportFile(db.Model):
+    __tablename__ = 'import_file'
+    source = db.Column(db.String(255), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Fingerprint of the workbook row each biller was last imported from
+class ImportFingerprint(db.Model):
+    __tablename__ = 'import_fingerprint'
+    name = db.Column(db.String(100), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    fingerprint = db.Column(db.String(16), nullable=False)
+
+# Workbook imports queued through POST /api/imports, see imports.py
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    name_col = db.Column(db.String(100), nullable=False)
+    status_col = db.Column(db.String(100))
+    web_col = db.Column(db.String(100))
+    state = db.Column(db.String(20), nullable=False, default='queued')
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    unchanged = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'category': self.category,
+            'state': self.state,
+            'rows_processed': self.rows_processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
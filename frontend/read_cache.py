@@ -0,0 +1,182 @@
+"""Cache of serialized JSON responses for the list endpoints.
+
+Entries are the response body bytes, keyed by path plus query arguments,
+so a hit is a dictionary lookup and no JSON encoding. Every entry carries
+tags naming the data it was built from (``category:ISP``, ``top_50``...).
+Write endpoints invalidate the tags they touched, bulk writers clear
+everything, and a TTL bounds staleness from writers that cannot reach
+this process.
+
+The default backend is an in-process LRU. Set ``READ_CACHE_URL`` to a
+``redis://`` URL to share one cache (and its invalidations) between
+server workers and maintenance scripts; this needs the ``redis`` package.
+"""
+from collections import OrderedDict
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 60
+
+
+def make_key(path, args):
+    """Stable key for a path and its query arguments, independent of their order."""
+    return f'{path}?{urlencode(sorted(args.items(multi=True)))}'
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry and a tag index."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._generation = 0
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body, ttl, tags, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend:
+    """Shared backend: one Redis string per entry and one set of keys per tag."""
+
+    def __init__(self, url, prefix='biller-tracker:cache:'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._generation_key = prefix + 'generation'
+
+    def generation(self):
+        return int(self._redis.get(self._generation_key) or 0)
+
+    def get(self, key):
+        return self._redis.get(self._prefix + key)
+
+    def set(self, key, body, ttl, tags, generation):
+        if generation != self.generation():
+            return
+        pipe = self._redis.pipeline()
+        pipe.set(self._prefix + key, body, ex=ttl)
+        for tag in tags:
+            tag_key = f'{self._prefix}tag:{tag}'
+            pipe.sadd(tag_key, key)
+            # A tag set outliving its entries is harmless, just bound it
+            pipe.expire(tag_key, ttl * 2)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        self._redis.incr(self._generation_key)
+        for tag in tags:
+            tag_key = f'{self._prefix}tag:{tag}'
+            keys = self._redis.smembers(tag_key)
+            pipe = self._redis.pipeline()
+            if keys:
+                pipe.delete(*(self._prefix + key.decode('utf-8') for key in keys))
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        self._redis.incr(self._generation_key)
+        keys = [key for key in self._redis.scan_iter(match=self._prefix + '*')
+                if key.decode('utf-8') != self._generation_key]
+        if keys:
+            self._redis.delete(*keys)
+
+
+def current():
+    """The ResponseCache of the current Flask app, see ``app.create_app``."""
+    from flask import current_app
+
+    return current_app.extensions['response_cache']
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=DEFAULT_TTL_SECONDS):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        ttl = int(os.environ.get('READ_CACHE_TTL', DEFAULT_TTL_SECONDS))
+        url = os.environ.get('READ_CACHE_URL', '').strip()
+        if url:
+            return cls(RedisBackend(url), ttl)
+        max_entries = int(os.environ.get('READ_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        return cls(MemoryBackend(max_entries), ttl)
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def generation(self):
+        """Token to take before reading the database and pass to ``put``.
+
+        ``put`` drops the entry if anything was invalidated in between, so a
+        response built from rows older than a concurrent write is not cached.
+        """
+        return self.backend.generation() if self.enabled else None
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        return self.backend.get(key)
+
+    def put(self, key, body, tags, generation):
+        if self.enabled:
+            self.backend.set(key, body, self.ttl, frozenset(tags), generation)
+
+    def invalidate(self, *tags):
+        self.backend.invalidate(tags)
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,141 @@
+"""Full-text search over biller name, notes and web.
+
+The ``biller_fts`` FTS5 table is an external-content index over the biller
+table, created by a migration and kept in sync by triggers, so inserts and
+updates from the API and from import scripts are indexed automatically.
+When the SQLite build has no FTS5 support, or the database is not SQLite,
+the migration is skipped and callers fall back to case-insensitive
+``LIKE`` matching.
+
+The unicode61 tokenizer uses Unicode 6.1 tables in which Myanmar vowel
+signs, medials and the virama are separators, so Burmese names would be
+indexed as single consonants. Those combining marks are declared as
+``tokenchars``, and queries split words the same way: letters, numbers
+and marks are word characters, everything else separates words.
+"""
+import unicodedata
+
+from sqlalchemy import Integer, column, text
+
+# bm25 weights for the (name, notes, web) columns, name matches rank first
+RANK_WEIGHTS = (10.0, 1.0, 2.0)
+
+# Myanmar, Myanmar Extended-B and Myanmar Extended-A
+_MYANMAR_BLOCKS = ((0x1000, 0x10A0), (0xA9E0, 0xAA00), (0xAA60, 0xAA80))
+MYANMAR_MARKS = ''.join(
+    chr(cp) for start, end in _MYANMAR_BLOCKS for cp in range(start, end)
+    if unicodedata.category(chr(cp)).startswith('M')
+)
+TOKENIZE = f"unicode61 remove_diacritics 2 tokenchars '{MYANMAR_MARKS}'"
+_WORD_CATEGORIES = ('L', 'N', 'M')
+
+
+def create_fts_index(conn):
+    """Create biller_fts and its sync triggers, then index existing rows."""
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS biller_fts USING fts5("
+        "name, notes, web, content='biller', content_rowid='id', "
+        f'tokenize="{TOKENIZE}")'
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS biller_fts_ai AFTER INSERT ON biller BEGIN "
+        "INSERT INTO biller_fts(rowid, name, notes, web) "
+        "VALUES (new.id, new.name, new.notes, new.web); END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS biller_fts_ad AFTER DELETE ON biller BEGIN "
+        "INSERT INTO biller_fts(biller_fts, rowid, name, notes, web) "
+        "VALUES ('delete', old.id, old.name, old.notes, old.web); END"
+    ))
+    # Only reindex when a searchable column changes, status updates skip it
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS biller_fts_au AFTER UPDATE OF name, notes, web ON biller BEGIN "
+        "INSERT INTO biller_fts(biller_fts, rowid, name, notes, web) "
+        "VALUES ('delete', old.id, old.name, old.notes, old.web); "
+        "INSERT INTO biller_fts(rowid, name, notes, web) "
+        "VALUES (new.id, new.name, new.notes, new.web); END"
+    ))
+    conn.execute(text("INSERT INTO biller_fts(biller_fts) VALUES ('rebuild')"))
+
+
+def drop_fts_index(conn):
+    for trigger in ('biller_fts_ai', 'biller_fts_ad', 'biller_fts_au'):
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    conn.execute(text('DROP TABLE IF EXISTS biller_fts'))
+
+
+def split_words(term):
+    """Split ``term`` into words, keeping combining marks inside words."""
+    words = []
+    current = []
+    for ch in term:
+        if unicodedata.category(ch).startswith(_WORD_CATEGORIES):
+            current.append(ch)
+        elif current:
+            words.append(''.join(current))
+            current = []
+    if current:
+        words.append(''.join(current))
+    return words
+
+
+def fts_available(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    row = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'biller_fts'"
+    )).first()
+    return row is not None
+
+
+def build_match_query(term):
+    """Turn free text into an FTS5 query where every word is a prefix match.
+
+    ``"city ma"`` becomes ``"city"* "ma"*``, so results contain all words and
+    the last one can still be partially typed. Returns None if the term has
+    no searchable words.
+    """
+    tokens = split_words(term or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_ids(match_query):
+    """Selectable of biller ids matching ``match_query``, for use with ``in_()``."""
+    return text(
+        'SELECT rowid FROM biller_fts WHERE biller_fts MATCH :match_query'
+    ).bindparams(match_query=match_query).columns(column('rowid', Integer))
+
+
+def typeahead(conn, term, limit=10):
+    """Return the top ``limit`` billers for ``term`` as dicts, best match first."""
+    if fts_available(conn):
+        match_query = build_match_query(term)
+        if not match_query:
+            return []
+        rows = conn.execute(text(
+            'SELECT b.id, b.name, b.category, b.status '
+            'FROM biller_fts JOIN biller b ON b.id = biller_fts.rowid '
+            'WHERE biller_fts MATCH :match_query '
+            'ORDER BY bm25(biller_fts, :w_name, :w_notes, :w_web), b.name '
+            'LIMIT :limit'
+        ), {
+            'match_query': match_query,
+            'w_name': RANK_WEIGHTS[0],
+            'w_notes': RANK_WEIGHTS[1],
+            'w_web': RANK_WEIGHTS[2],
+            'limit': limit,
+        })
+    else:
+        term = (term or '').strip()
+        if not term:
+            return []
+        rows = conn.execute(text(
+            'SELECT id, name, category, status FROM biller '
+            'WHERE LOWER(name) LIKE :pattern ORDER BY name LIMIT :limit'
+        ), {'pattern': f'{term.lower()}%', 'limit': limit})
+    return [
+        {'id': row[0], 'name': row[1], 'category': row[2], 'status': row[3]}
+        for row in rows
+    ]
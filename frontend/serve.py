@@ -0,0 +1,116 @@
+"""Production entry point for the Biller Tracker API.
+
+Runs the Flask app under a real WSGI server instead of the single-threaded
+debug server started by ``python app.py``:
+
+* waitress (default): one process with a pool of worker threads. Works on
+  Windows and Linux.
+* gunicorn: several worker processes, each with its own thread pool.
+  Linux/macOS only.
+
+Tables and migrations are brought up to date once, before the server
+starts; workers only build the app with ``create_app()``.
+
+Neither server is a hard dependency; install the one you use
+(``pip install waitress`` or ``pip install gunicorn``).
+
+Status change events (/api/events) are delivered by the process that
+committed the change, so with several gunicorn workers a dashboard only
+sees changes made through its own worker. Keep ``--workers 1`` when live
+updates matter and scale with ``--threads`` instead.
+
+Both servers run every request, event streams included, on their worker
+threads, and an open stream holds its thread until the client goes
+away. More sockets do not help; only threads do. ``--threads`` is
+therefore the number of threads left for the API, and each process gets
+``SSE_MAX_SUBSCRIBERS`` (see events.py) extra threads for streams. Once
+that many dashboards are connected, further ones are told to retry
+later instead of taking an API thread.
+
+Usage: python serve.py [--server waitress|gunicorn] [--host 0.0.0.0] [--port 5000]
+                       [--workers 2] [--threads 8]
+"""
+import argparse
+import os
+import sys
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 8
+
+
+def serve_waitress(app, host, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        sys.exit('waitress is not installed: pip install waitress')
+    serve(app, host=host, port=port, threads=threads, channel_timeout=120)
+
+
+def reset_connection_pool(app):
+    """Drop connections inherited from the parent; each worker opens its own."""
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def serve_gunicorn(app, host, port, workers, threads):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit('gunicorn is not installed: pip install gunicorn')
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{host}:{port}')
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # Event streams are long-lived; don't let the arbiter kill them
+            self.cfg.set('timeout', 0)
+            self.cfg.set('graceful_timeout', 30)
+            self.cfg.set('post_fork', lambda server, worker: reset_connection_pool(app))
+
+        def load(self):
+            return app
+
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Biller Tracker API with a production WSGI server.')
+    parser.add_argument('--server', choices=('waitress', 'gunicorn'),
+                        default=os.environ.get('BILLER_SERVER', 'waitress'),
+                        help='WSGI server to use (default: %(default)s)')
+    parser.add_argument('--host', default=os.environ.get('BILLER_HOST', DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('BILLER_PORT', DEFAULT_PORT)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('BILLER_WORKERS', 1)),
+                        help='worker processes, gunicorn only (default: %(default)s)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('BILLER_THREADS', DEFAULT_THREADS)),
+                        help='API threads per worker, event stream threads are added on top '
+                             '(default: %(default)s)')
+    args = parser.parse_args()
+
+    # Import after parsing so --help works without touching the database
+    from app import create_app, create_schema
+
+    app = create_app()
+    # Once per deployment, before any worker starts serving
+    with app.app_context():
+        create_schema()
+
+    # Event streams pin a thread each; reserve them on top of the API threads
+    stream_threads = app.extensions['event_broker'].max_subscribers
+    threads = args.threads + stream_threads
+
+    print(f'Serving on http://{args.host}:{args.port} with {args.server} '
+          f'({args.workers if args.server == "gunicorn" else 1} worker(s) x {threads} threads, '
+          f'{stream_threads} of them for event streams)')
+    if args.server == 'gunicorn':
+        serve_gunicorn(app, args.host, args.port, args.workers, threads)
+    else:
+        serve_waitress(app, args.host, args.port, threads)
+
+
+if __name__ == '__main__':
+    main()
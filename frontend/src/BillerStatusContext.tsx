@@ -1,11 +1,16 @@
-import React, { createContext, useContext, useRef } from 'react';
+import React, { createContext, useContext, useEffect, useRef } from 'react';
 
 export interface BillerStatusEvent {
   id: string | number;
   status: string;
+  category?: string;
   [key: string]: any;
 }
 
+// Names repeat across categories, so a row matches on name and category
+export const matchesBiller = (event: BillerStatusEvent, name: string, category: string) =>
+  event.id === name && (event.category === undefined || event.category === category);
+
 interface BillerStatusContextValue {
   subscribe: (fn: (event: BillerStatusEvent) => void) => () => void;
   publish: (event: BillerStatusEvent) => void;
@@ -33,6 +38,35 @@ export const BillerStatusProvider: React.FC<{ children: React.ReactNode }> = ({
     listeners.current.forEach(fn => fn(event));
   };
 
+  // Forward status changes committed by any client, pushed by the server
+  useEffect(() => {
+    let source: EventSource | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let delay = 1000;
+    const connect = () => {
+      source = new EventSource('http://localhost:5000/api/events');
+      source.addEventListener('ready', () => {
+        delay = 1000;
+      });
+      source.addEventListener('status', (message: MessageEvent) => {
+        const change = JSON.parse(message.data);
+        publish({ ...change, id: change.name, status: change.new_status, billerId: change.id });
+      });
+      // EventSource gives up on non-200 answers; reconnect with backoff
+      source.onerror = () => {
+        if (source && source.readyState === EventSource.CLOSED) {
+          retryTimer = setTimeout(connect, delay);
+          delay = Math.min(delay * 2, 60000);
+        }
+      };
+    };
+    connect();
+    return () => {
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, []);
+
   return (
     <BillerStatusContext.Provider value={{ subscribe, publish }}>
       {children}
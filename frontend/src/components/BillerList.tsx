@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { useBillerStatusSync } from '../BillerStatusContext';
+import { matchesBiller, useBillerStatusSync } from '../BillerStatusContext';
 import { useTheme, alpha } from '@mui/material/styles';
 import * as XLSX from 'xlsx';
 import { saveAs } from 'file-saver';
@@ -23,6 +23,7 @@ import { saveAs } from 'file-saver';
   interface Biller {
     id: number;
     name: string;
+    category: string;
     status: string;
   }
 
@@ -70,7 +71,7 @@ import { saveAs } from 'file-saver';
       // Publish biller status change for real-time sync
       const biller = billers.find(b => b.id === billerId);
       if (biller) {
-        publish({ id: biller.name, status: newStatus });
+        publish({ id: biller.name, category: biller.category, status: newStatus });
       }
       setError(null); // Clear any previous errors
     } else {
@@ -131,7 +132,7 @@ import { saveAs } from 'file-saver';
       const unsubscribe = subscribe(event => {
         setBillers(prevBillers =>
           prevBillers.map(biller =>
-            biller.name === event.id
+            matchesBiller(event, biller.name, biller.category)
               ? { ...biller, status: event.status }
               : biller
           )
@@ -1,6 +1,6 @@
 
 import React, { useState, useEffect } from 'react';
-import { useBillerStatusSync } from '../BillerStatusContext';
+import { matchesBiller, useBillerStatusSync } from '../BillerStatusContext';
 import axios from 'axios';
 import { useNavigate } from 'react-router-dom';
 import {
@@ -77,15 +77,15 @@ const Top50BillersList: React.FC<Props> = ({ onDashboardUpdate }) => {
   useEffect(() => {
     fetchData();
     // Subscribe to biller status changes
-    const unsubscribe = subscribe((event: { id: string; status: string }) => {
+    const unsubscribe = subscribe(event => {
       setBillerData(prev =>
         prev.map(biller =>
-          biller.Biller === event.id ? { ...biller, Status: event.status } : biller
+          matchesBiller(event, biller.Biller, biller.Category) ? { ...biller, Status: event.status } : biller
         )
       );
       setFilteredData(prev =>
         prev.map(biller =>
-          biller.Biller === event.id ? { ...biller, Status: event.status } : biller
+          matchesBiller(event, biller.Biller, biller.Category) ? { ...biller, Status: event.status } : biller
         )
       );
     });
@@ -129,24 +129,11 @@ const Top50BillersList: React.FC<Props> = ({ onDashboardUpdate }) => {
         biller.Biller.toLowerCase().includes(searchQuery.toLowerCase())
       ));
       // Publish for real-time sync
-      publish({ id: biller, status: newStatus }); // biller is the name string
+      publish({ id: biller, category: 'Top 50', status: newStatus }); // biller is the name string
   
-      // Update dashboard if callback provided
-      if (onDashboardUpdate) {
-        // If the backend provided dashboard data, use it
-        if (response.data.dashboard) {
-          onDashboardUpdate(response.data.dashboard);
-        } else {
-          // Otherwise, fetch the latest dashboard data
-          try {
-            const statusResponse = await axios.get('http://localhost:5000/api/top-50-status');
-            if (statusResponse.data) {
-              onDashboardUpdate(statusResponse.data);
-            }
-          } catch (err) {
-            console.error('Error fetching updated dashboard data:', err);
-          }
-        }
+      // Update dashboard with the counters returned by the backend
+      if (onDashboardUpdate && response.data.dashboard) {
+        onDashboardUpdate(response.data.dashboard);
       }
   
       setNotification({
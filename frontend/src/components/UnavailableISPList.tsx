@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { useBillerStatusSync } from '../BillerStatusContext';
+import { matchesBiller, useBillerStatusSync } from '../BillerStatusContext';
 import {
   Box,
   Paper,
@@ -89,15 +89,15 @@ const UnavailableISPList: React.FC<Props> = ({ onDashboardUpdate }) => {
   useEffect(() => {
     fetchData();
     // Subscribe to biller status changes
-    const unsubscribe = subscribe((event: { id: string; status: string }) => {
+    const unsubscribe = subscribe(event => {
       setISPData(prev =>
         prev.map(item =>
-          item.ISP === event.id ? { ...item, Status: event.status } : item
+          matchesBiller(event, item.ISP, 'ISP') ? { ...item, Status: event.status } : item
         )
       );
       setFilteredData(prev =>
         prev.map(item =>
-          item.ISP === event.id ? { ...item, Status: event.status } : item
+          matchesBiller(event, item.ISP, 'ISP') ? { ...item, Status: event.status } : item
         )
       );
     });
@@ -145,7 +145,7 @@ const UnavailableISPList: React.FC<Props> = ({ onDashboardUpdate }) => {
         isp.ISP.toLowerCase().includes(searchQuery.toLowerCase())
       ));
       // Publish for real-time sync
-      publish({ id: isp, status: newStatus }); // isp is the name string
+      publish({ id: isp, category: 'ISP', status: newStatus }); // isp is the name string
       
       setNotification({
         message: 'Status updated successfully',
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { useBillerStatusSync } from '../BillerStatusContext';
+import { matchesBiller, useBillerStatusSync } from '../BillerStatusContext';
 import axios from 'axios';
 import {
   Box,
@@ -77,15 +77,15 @@ const UnavailableMFIList: React.FC<Props> = ({ onDashboardUpdate }) => {
   useEffect(() => {
     fetchData();
     // Subscribe to biller status changes
-    const unsubscribe = subscribe((event: { id: string; status: string }) => {
+    const unsubscribe = subscribe(event => {
       setMFIData(prev =>
         prev.map(item =>
-          item.MFI === event.id ? { ...item, Status: event.status } : item
+          matchesBiller(event, item.MFI, 'MFI') ? { ...item, Status: event.status } : item
         )
       );
       setFilteredData(prev =>
         prev.map(item =>
-          item.MFI === event.id ? { ...item, Status: event.status } : item
+          matchesBiller(event, item.MFI, 'MFI') ? { ...item, Status: event.status } : item
         )
       );
     });
@@ -130,7 +130,7 @@ const UnavailableMFIList: React.FC<Props> = ({ onDashboardUpdate }) => {
         mfi.MFI.toLowerCase().includes(searchQuery.toLowerCase())
       ));
       // Publish for real-time sync
-      publish({ id: mfi, status: newStatus }); // mfi is the name string
+      publish({ id: mfi, category: 'MFI', status: newStatus }); // mfi is the name string
       
       setNotification({
         message: 'Status updated successfully',
@@ -1,4 +1,6 @@
-import sqlite3
+from app import create_app
+from models import db, Biller, bump_data_version, rebuild_status_counters
+import read_cache
 
 # List of Top 50 biller names from fifty.xlsx
 TOP_50_NAMES = [
@@ -15,13 +17,17 @@ TOP_50_NAMES = [
     'iSure', 'mDrive', 'Mahar Mobile'
 ]
 
-conn = sqlite3.connect(r'../instance/biller_tracker.db')
-cursor = conn.cursor()
-
-updated = 0
-for name in TOP_50_NAMES:
-    cursor.execute("UPDATE Biller SET is_top_50=1, category='Top 50' WHERE name=?", (name,))
-    updated += cursor.rowcount
-conn.commit()
-conn.close()
+with create_app().app_context():
+    result = db.session.execute(
+        db.update(Biller)
+        .where(Biller.name.in_(TOP_50_NAMES))
+        .values(is_top_50=True, category='Top 50')
+        .execution_options(synchronize_session=False)
+    )
+    updated = result.rowcount
+    # Categories changed, recount the status buckets and invalidate cached API responses
+    rebuild_status_counters()
+    bump_data_version()
+    db.session.commit()
+    read_cache.current().clear()
 print(f"Updated {updated} Top 50 billers.")
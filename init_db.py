@@ -6,42 +6,30 @@ project_dir = os.path.dirname(os.path.abspath(__file__))
 frontend_dir = os.path.join(project_dir, 'frontend')
 sys.path.append(frontend_dir)
 
-from app import app, db, Biller
-from datetime import datetime
-import pandas as pd
+from app import create_app, create_schema
+from models import db
+from importer import DEFAULT_CHUNK_SIZE, import_workbook
+import argparse
 
-def init_db():
+def init_db(chunk_size=DEFAULT_CHUNK_SIZE, force=False):
+    app = create_app()
     with app.app_context():
         print('Database URI:', app.config['SQLALCHEMY_DATABASE_URI'])
         
         # Create tables
-        db.create_all()
+        create_schema()
         print('Created database tables')
         
-        # Clear existing data
-        deleted_count = db.session.query(Biller).delete()
-        print(f'Cleared {deleted_count} existing records')
-        
         try:
-            # Read data from Excel file
+            # Stream data from the Excel file; only new and changed rows are written
             excel_path = os.path.join(os.path.dirname(__file__), 'book.xlsx')
-            df = pd.read_excel(excel_path)
-            
-            # Convert Excel data to Biller objects
-            billers = []
-            for _, row in df.iterrows():
-                biller = Biller(
-                    name=str(row['Biller Name']),
-                    status=str(row['Status']).lower().replace(' ', '_'),
-                    category='Other',  # Default category
-                    is_top_50=False  # Default value
-                )
-                billers.append(biller)
-            
-            # Add all billers to database
-            db.session.bulk_save_objects(billers)
-            db.session.commit()
-            print(f'Successfully imported {len(billers)} billers from Excel')
+            counts = import_workbook(excel_path, 'Biller Name', 'Other', 'Status', web_col=None,
+                                     chunk_size=chunk_size, force=force)
+            if counts['skipped']:
+                print('book.xlsx is unchanged since the last import, skipped')
+            else:
+                print(f'Successfully imported {counts["inserted"]} new and {counts["updated"]} '
+                      f'changed billers from Excel ({counts["unchanged"]} unchanged)')
             
         except Exception as e:
             print(f'Error importing data from Excel: {str(e)}')
@@ -50,4 +38,10 @@ def init_db():
         db.session.commit()
 
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Create the database and import book.xlsx into it.')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='rows read and written per batch (default: %(default)s)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-import book.xlsx even if it has not changed since the last run')
+    args = parser.parse_args()
+    init_db(chunk_size=args.chunk_size, force=args.force)
\ No newline at end of file